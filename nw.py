@@ -38,6 +38,7 @@ import nwConfig
 import nwClasses
 import nwProcessInput
 import nwCrawl
+import nwTransport
 
     
 
@@ -73,6 +74,26 @@ def giveupthefunc():
                         return None
     return funcs[0] if funcs else None
 
+def targetOutputFilename(target):
+    ''' Returns the output filename for a single target when
+    writing one XML per target, the --outputfile name with
+    the target id tacked on before the extension.
+    '''
+    (base,ext) = os.path.splitext(werd.fileXMLOutput)
+    return(base + '-' + str(target.id) + ext)
+
+def writeOutputXML(filename,xml):
+    ''' Writes the serialized XML out to filename.
+    '''
+    myfunc = str(giveupthefunc())
+    # make a snippet for the debug log
+    xmllogstring = xml[0:100] + '......'
+    logging.debug(myfunc + '\t' + xmllogstring)
+    # now we have the results so let's write it to the output file
+    with open(filename,'wb') as f:
+        f.write(xml)
+    logging.info(myfunc + '\t' + "Wrote output XML: '" + filename + "'")
+
 def main():
     ''' This is the main runtime block of the NetWalk application.
 
@@ -92,23 +113,36 @@ def main():
         for o in werd.loo_targets:
             logging.debug(myfunc + '\t' + o.dumpdata())
     print(' ')
-    # pick one target and send to burrow
+    # start the parse workers before the crawl threads are going
+    nwCrawl.startParsing()
+    # send every target to burrow at once, each gets its own CrawlResults
+    pool = nwClasses.WorkerPool(nwConfig.targetWorkers,'targets')
     for tgt in werd.loo_targets:
-        # now kick off the burrow
-        crawlresults = nwCrawl.burrow(tgt)
-        logging.debug(myfunc + '\t' + 
-            "Now have crawl results, attemping to serialize into XML")
-        xml = crawlresults.genxml()
-        # make a snippet for the debug log
-        xmllogstring = xml[0:100] + '......'
-        logging.debug(myfunc + '\t' + xmllogstring)
-        # now we have the results so let's write it to the output file
-        with open(werd.fileXMLOutput,'wb') as f:
-            f.write(xml)
-        break # just doing the first target for now
+        pool.submit(nwCrawl.burrow,tgt)
+    loo_crawlresults = []
+    for tgt,crawlresults in zip(werd.loo_targets,pool.join()):
+        if crawlresults == None:
+            msgtext = "Crawl of target ID: " + str(tgt.id) + " returned no results."
+            dingding = nwClasses.Event(msgtext,myfunc,False,True)
+        else:
+            loo_crawlresults.append((tgt,crawlresults))
+    # done talking to devices, log out of any parked transport sessions.
+    #  not done in burrow since other targets may still be using them
+    nwTransport.closeIdleSessions()
+    nwCrawl.stopParsing()
+    logging.debug(myfunc + '\t' + 
+        "Now have crawl results, attemping to serialize into XML")
+    if werd.splitOutput:
+        for tgt,crawlresults in loo_crawlresults:
+            writeOutputXML(targetOutputFilename(tgt),crawlresults.genxml())
+    else:
+        xml = nwClasses.genxml_combined([c for t,c in loo_crawlresults])
+        writeOutputXML(werd.fileXMLOutput,xml)
     # testing the objectification of the Cfg() data
     logging.debug(myfunc + '\t' + "Back in main...")
     logging.debug(myfunc + '\t' + werd.dumpdata())
+    # hit/miss counts for every pattern the parsers compiled
+    logging.debug(myfunc + '\t' + nwClasses.regexes.dumpdata())
     ''' Taking out this pickle section as it's struggling to pickle my custom 
     object structure for some reason.
     try:
@@ -132,7 +166,7 @@ if __name__ == '__main__':
     from optparse import OptionParser
     from optparse import OptionGroup
     usage = ("%prog [--help] [--debug] [--printtostdout] [--logfile] "
-        "[--inputfile] [--outputfile]")
+        "[--inputfile] [--outputfile] [--profile] [--splitoutput]")
     parser = OptionParser(usage, version='%prog ' + nwConfig.sVersion)
     # set up a usage string.
     parser.add_option('-i','--inputfile', 
@@ -150,6 +184,20 @@ if __name__ == '__main__':
                         "will contain the output topology XML. "
                         "Default is '"+nwConfig.defaultOutputXMLFilename+"'"
                         ),default=nwConfig.defaultOutputXMLFilename)
+    parser.add_option('-r','--profile',
+                    type='string',
+                    metavar='PROFILE',
+                    help=("Discovery profile to pull every target with, "
+                        "overriding the 'profile' attribute on the targets "
+                        "in the input XML. 'full' runs every discovery "
+                        "command, 'topology' only the ones needed to build "
+                        "the topology. Default is '" + nwConfig.discoveryProfile + "'"
+                        ),default=None)
+    parser.add_option('-s','--splitoutput',action='store_true',
+                    help=("Write one output XML per target, named after the "
+                        "--outputfile with the target id added (e.g., "
+                        "output-1.xml) instead of one combined XML."
+                        ),default=nwConfig.outputPerTarget)
     parser_debug = OptionGroup(parser,'Debug Options')
     parser_debug.add_option('-d','--debug',type='string',
             help=('Available levels are CRITICAL (3), ERROR (2), '
@@ -245,6 +293,11 @@ if __name__ == '__main__':
         except Exception as exer:
             logging.info("__main__ : Exception attempting to open fromfile: " + str(exer))
 
+    werd.splitOutput = options.splitoutput
+    if options.profile != None:
+        werd.discoveryProfile = options.profile
+        logging.info("__main__ : Discovery profile set to '" + werd.discoveryProfile + "'")
+
     logging.debug('__main__ : werd.fileXMLInput = ' + werd.fileXMLInput)
     logging.debug('__main__ : werd.fileXMLOutput = ' + werd.fileXMLOutput)
 
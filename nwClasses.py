@@ -4,10 +4,15 @@ NetWalk application.
 
 '''
 
+import re
 import time
+import random
 import datetime
 import logging
 import pickle
+import threading
+import Queue
+import collections
 import xml.etree.ElementTree as ET
 
 
@@ -38,18 +43,345 @@ class Counter(object):
     def read(self):
         return str(self.value)
 
+class Backoff(object):
+    ''' Attempt budget for a single device. attempt() is called 
+    before every try and returns False once the budget is spent.
+    delay() hands out the wait before the next try, doubling from
+    nwConfig.retryBaseDelay up to nwConfig.retryMaxDelay with 
+    random jitter so parked devices don't all come back at once.
+
+    '''
+    def __init__(self,budget):
+        self.budget = budget
+        self.attempts = 0
+        self.waits = 0
+    def attempt(self):
+        self.attempts += 1
+        return self.attempts <= self.budget
+    def exhausted(self):
+        return self.attempts >= self.budget
+    def delay(self):
+        delay = min(nwConfig.retryMaxDelay,
+                    nwConfig.retryBaseDelay * (2 ** self.waits))
+        self.waits += 1
+        # keep at least half the backoff and jitter the rest
+        return delay / 2.0 + random.uniform(0,delay / 2.0)
+    def reset(self):
+        self.attempts = 0
+        self.waits = 0
+
+class Retry(object):
+    ''' Returned by a WorkerPool job that needs to wait before it 
+    can go on. The job is parked for delay seconds and then queued 
+    again, either as the same call or as func(*args) if given.
+
+    '''
+    def __init__(self,delay,func=None,args=None):
+        self.delay = delay
+        self.func = func
+        self.args = args
+
+class TrackedRegex(object):
+    ''' A compiled pattern handed out by the RegexRegistry along
+    with how many searches hit and missed. The counters are only
+    there for tuning so they aren't locked, and searches done in
+    the parse pool's worker processes are counted over there.
+
+    '''
+    def __init__(self,pattern):
+        self.pattern = pattern
+        self.regex = re.compile(pattern)
+        self.hits = 0
+        self.misses = 0
+    def search(self,string):
+        match = self.regex.search(string)
+        if match:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return match
+
+class RegexRegistry(object):
+    ''' Compiles each pattern once no matter how many identifiers
+    or parser objects ask for it. get() returns the shared
+    TrackedRegex for the pattern.
+
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.patterns = {}
+    def get(self,pattern):
+        with self.lock:
+            tracked = self.patterns.get(pattern)
+            if tracked == None:
+                tracked = TrackedRegex(pattern)
+                self.patterns[pattern] = tracked
+        return tracked
+    def dumpdata(self):
+        with self.lock:
+            loo_tracked = list(self.patterns.values())
+        loo_tracked.sort(key=lambda t: t.hits + t.misses,reverse=True)
+        msgtext = ("REGEX REGISTRY: " + str(len(loo_tracked)) + " patterns\n")
+        for t in loo_tracked:
+            msgtext += ("\t" + "HITS: " + str(t.hits) + ", MISSES: " + 
+                str(t.misses) + ", PATTERN: " + repr(t.pattern) + '\n')
+        return msgtext
+
+''' the one registry everything compiles its patterns through '''
+regexes = RegexRegistry()
+
+class RegexSet(object):
+    ''' Does the work of an if/elif chain of searches over a list
+    of patterns with one combined search per line. first_match()
+    returns the index of the first pattern (in list order) that 
+    matches along with its named groups, or (None,None).
+
+    Named groups are renamed inside the combined regex so the 
+    patterns can share group names. Patterns can't use 
+    backreferences.
+
+    '''
+    def __init__(self,patterns):
+        self.regexes = [regexes.get(p) for p in patterns]
+        self.groupnames = [t.regex.groupindex.keys() for t in self.regexes]
+        alternatives = []
+        for i,pattern in enumerate(patterns):
+            renamed = re.sub(r'\(\?P<(\w+)>','(?P<rs' + str(i) + r'_\1>',pattern)
+            alternatives.append('(?P<rs' + str(i) + '>' + renamed + ')')
+        self.combined = regexes.get('|'.join(alternatives))
+    def first_match(self,line):
+        match = self.combined.search(line)
+        if not match:
+            return (None,None)
+        # the combined search stops at the leftmost match so a pattern 
+        #  earlier in the list could still match further along the line
+        for i,tracked in enumerate(self.regexes):
+            if match.start('rs' + str(i)) != -1:
+                groups = {}
+                for name in self.groupnames[i]:
+                    groups[name] = match.group('rs' + str(i) + '_' + name)
+                return (i,groups)
+            own = tracked.search(line)
+            if own:
+                return (i,own.groupdict())
+        return (None,None)
+
+def memoize(maxsize):
+    ''' Decorator that remembers the results of a one argument 
+    function in a plain dict. The dict is emptied once it holds
+    maxsize results so it can't grow forever.
+    '''
+    def decorate(func):
+        cache = {}
+        def memoized(arg):
+            try:
+                return cache[arg]
+            except KeyError:
+                pass
+            result = func(arg)
+            if len(cache) >= maxsize:
+                cache.clear()
+            cache[arg] = result
+            return result
+        memoized.__name__ = func.__name__
+        memoized.__doc__ = func.__doc__
+        memoized.cache = cache
+        return memoized
+    return decorate
+
+re_hexmac = regexes.get(r'^[0-9a-f]{12}$')
+
+@memoize(nwConfig.macCacheSize)
+def parse_mac(macstring):
+    ''' Returns the MAC as a 48 bit integer no matter which of 
+    the usual formats it came in as (00-00-00-00-00-00, 
+    00:00:00:00:00:00, 0000.0000.0000, 000000000000). 
+    Returns None if it isn't a MAC.
+    '''
+    try:
+        tempstring = macstring.strip().lower()
+    except AttributeError:
+        return None
+    for sep in (':','-','.'):
+        tempstring = tempstring.replace(sep,'')
+    if not re_hexmac.search(tempstring):
+        return None
+    return int(tempstring,16)
+
+@memoize(nwConfig.macCacheSize)
+def format_mac(macint):
+    ''' Returns the 48 bit integer MAC as lowercase colon
+    separated octets.
+    '''
+    tempstring = '%012x' % macint
+    return ':'.join(tempstring[i:i+2] for i in range(0,12,2))
+
+def normalize_mac(macstring):
+    ''' Returns the MAC as lowercase colon separated octets
+    or None if it isn't a MAC.
+    '''
+    macint = parse_mac(macstring)
+    if macint == None:
+        return None
+    return format_mac(macint)
+
+def mac_key(macstring):
+    ''' What MACs are compared and hashed by: the 48 bit integer
+    if the string parses, otherwise the string as it is (e.g., '' 
+    or a MAC that already has the manufacturer tacked on).
+    '''
+    macint = parse_mac(macstring)
+    if macint == None:
+        return macstring
+    return macint
+
+''' the id of the target whose crawl the current thread is working 
+on so Events can be tagged with it. WorkerPool jobs run with the 
+target of whoever submitted them.
+'''
+eventcontext = threading.local()
+
+def current_target():
+    ''' Returns the id of the target the current thread is 
+    crawling or None if it isn't working for one.
+    '''
+    return getattr(eventcontext,'targetid',None)
+
+class WorkerPool(object):
+    ''' Small pool of worker threads used by the crawler to run
+    independent jobs (e.g., priming entrypoints) side by side.
+    Jobs are handed in with submit() and the results come back
+    from join() in the same order the jobs were submitted. 
+
+    A job that returns a Retry is parked on a timer instead of 
+    holding up its worker, which moves on to the other jobs.
+    join() still waits for parked jobs to come back and finish.
+
+    Jobs run with the current_target() of the thread that 
+    submitted them.
+
+    '''
+    def __init__(self,numworkers,name=None):
+        if name == None:
+            name = "WorkerPool"
+        self.name = name
+        self.numworkers = max(1,int(numworkers))
+        self.jobs = Queue.Queue()
+        self.results = {}
+        self.lock = threading.Lock()
+        self.ticket = 0
+        self.threads = []
+        for i in range(0,self.numworkers):
+            t = threading.Thread(target=self.worker,
+                                name=self.name + "-" + str(i+1))
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+    def worker(self):
+        ''' Pulls jobs off the queue until it receives the
+        stop marker (a job with no function).
+        '''
+        while True:
+            ticket,func,args,targetid = self.jobs.get()
+            if func == None:
+                self.jobs.task_done()
+                break
+            eventcontext.targetid = targetid
+            result = None
+            try:
+                result = func(*args)
+            except Exception as ex_job:
+                msgtext = ("Exception running job " + str(ticket) + 
+                    " in " + self.name + ": " + str(ex_job))
+                dingding = Event(msgtext,"WorkerPool.worker()",False,True)
+            if isinstance(result,Retry):
+                self.park(ticket,func,args,targetid,result)
+                continue
+            with self.lock:
+                self.results[ticket] = result
+            self.jobs.task_done()
+    def park(self,ticket,func,args,targetid,retry):
+        ''' Puts the job back on the queue once retry.delay is up.
+        The job stays unfinished while parked so join() keeps 
+        waiting on it.
+        '''
+        if retry.func != None:
+            func = retry.func
+            args = retry.args
+        logging.debug(self.name + '\t' + "Parking job " + str(ticket) + 
+            " for " + str(round(retry.delay,1)) + " seconds")
+        def requeue():
+            self.jobs.put((ticket,func,args,targetid))
+            # the put above counts as new work so this can't let join() go
+            self.jobs.task_done()
+        timer = threading.Timer(retry.delay,requeue)
+        timer.daemon = True
+        timer.start()
+    def submit(self,func,*args):
+        ''' Queues func(*args) to run on the next free worker
+        and returns the ticket number of the job.
+        '''
+        with self.lock:
+            self.ticket += 1
+            ticket = self.ticket
+        self.jobs.put((ticket,func,args,current_target()))
+        return ticket
+    def join(self):
+        ''' Waits for all submitted jobs to finish, stops the
+        workers and returns the list of results ordered by ticket.
+        '''
+        self.jobs.join()
+        for t in self.threads:
+            self.jobs.put((None,None,None,None))
+        for t in self.threads:
+            t.join()
+        return [self.results.get(k) for k in sorted(self.results.keys())]
+    def map(self,func,items):
+        ''' Runs func(item) for every item in the pool and 
+        returns the results in the same order as items.
+        '''
+        for item in items:
+            self.submit(func,item)
+        return self.join()
+
 class EventLog(list):
     ''' Inherited from list type to hold
     Event() objects. Primarily set up to 
     create methods for dumping the event log
     or attaching it to XML.
 
+    Events come in from every target's crawl threads
+    so appends and reads go through a lock.
+
     '''
     def __init__(self):
         self.type = "EventLog"
+        self.lock = threading.Lock()
+    def append(self,event):
+        with self.lock:
+            list.append(self,event)
+    def snapshot(self):
+        ''' Returns a copy of the events logged so far.
+        '''
+        with self.lock:
+            return list(self)
+    def genxml(self,x_root,targetids=None):
+        ''' Adds the eventlog element to x_root. If targetids
+        is passed only the events from those targets' crawls
+        (and the ones not from any crawl) are added.
+        '''
+        x_root_eventlog = ET.SubElement(x_root,'eventlog')
+        messages = self.snapshot()
+        if targetids != None:
+            messages = [m for m in messages 
+                if m.targetid == None or m.targetid in targetids]
+        for index,message in enumerate(messages):
+            orderid = str(index+1)
+            x_root_eventlog_event = ET.SubElement(x_root_eventlog,'event',attrib={'id':orderid})
+            x_root_eventlog_event.text = message.dump()
     def dumpdata(self):
         msgtext = ("EVENT LOG: \n")
-        for line in self:
+        for line in self.snapshot():
             msgtext += ("\t" + str(line) + '\n')
         return msgtext
 
@@ -79,6 +411,12 @@ class Cfg(object):
         self.currentUID = 1
         self.fromfile = ''
         self.fromfile_bool = False
+        # discovery profile from the command line, overrides the input XML
+        self.discoveryProfile = ''
+        # write one output XML per target instead of a combined one
+        self.splitOutput = nwConfig.outputPerTarget
+        # id and UID requests can come from WorkerPool threads
+        self.idlock = threading.Lock()
     def dumpdata(self):
         msgtext = ("TYPE: Cfg" + '\r\n' +
             "TARGETS: " + str(len(self.loo_targets)) + '\r\n' +
@@ -94,16 +432,20 @@ class Cfg(object):
     def neIdRequest(self):
         ''' Returns the currentNEidNumber + 1 as a string
         '''
-        self.currentNEidNumber+=1
-        logging.debug("Cfg().neIdRequest(): currentNEidNumber = " + str(self.currentNEidNumber))
-        return(str(self.currentNEidNumber))
+        with self.idlock:
+            self.currentNEidNumber+=1
+            neid = self.currentNEidNumber
+        logging.debug("Cfg().neIdRequest(): currentNEidNumber = " + str(neid))
+        return(str(neid))
     def genUID(self):
         ''' returns an incrementing number, useful for making sure
         element ID numbers are always unique. 
         '''
-        self.currentUID += 1
-        #logging.debug("Cfg().genUID(): currentUID = " + str(self.currentUID))
-        return(str(self.currentUID))
+        with self.idlock:
+            self.currentUID += 1
+            uid = self.currentUID
+        #logging.debug("Cfg().genUID(): currentUID = " + str(uid))
+        return(str(uid))
     def randomNumberBlock(self):
         ''' Generates a random 5 digit number string and returns it. 
         Useful for creating filenames on disk, etc.
@@ -138,6 +480,8 @@ class Event(object):
         self.funcname = funcname
         self.printnow = printnow
         self.lognow = lognow
+        # the target whose crawl logged this, None if not from a crawl
+        self.targetid = current_target()
         if printnow:
             print(self)
         if lognow:
@@ -168,6 +512,8 @@ class Target(object):
         or not to generate hop scripts rather than trying to reach the node directly. 
         '''
         self.hopdepth = 0
+        # name of the discovery profile to pull the target's NE's with
+        self.profile = nwConfig.discoveryProfile
     def dumpdata(self,rowentry=None):
         if rowentry == None:
             rowentry = False
@@ -181,6 +527,7 @@ class Target(object):
                 msgtext += (e.dump_rowformat() + '\n\r')
         msgtext += ("\t" + "AUTHLIST: " + str(len(self.authlist)) + '\n\r')
         msgtext += ("\t" + "HOPDEPTH: " + str(self.hopdepth) + '\n\r')
+        msgtext += ("\t" + "PROFILE: " + str(self.profile) + '\n\r')
         for e in self.authlist:
             msgtext += (e.dumpdata() + '\n\r')
         return msgtext
@@ -220,6 +567,11 @@ class Entrypoint(object):
         self.hopcount = 0
         self.hopcount_saved = 0
         self.directfailed = False
+        # nwTransport.Failure from the last pull if it was cut short
+        self.failure = None
+        # primer attempts left and how long to park the entry before the next
+        self.primerbudget = Backoff(nwConfig.primerAttempts)
+        self.retryafter = None
     def dumpdata_singleline(self):
         msg = ''
         msg += ("TYPE: Entrypoint, ID: " + self.id + ", IP: " + self.ip + ", HOSTNAME: " + self.hostname)
@@ -391,6 +743,11 @@ class NetworkElement(object):
                 self.value = ''
             def __repr__(self):
                 return(self.value)
+            def __setattr__(self,name,value):
+                self.__dict__[name] = value
+                if name == 'value':
+                    # parse once here so compares and hashes don't have to
+                    self.__dict__['key'] = mac_key(value)
         def __init__(self):
             self.xmldesc = 'macs'
             self.macslist = []
@@ -432,9 +789,9 @@ class NetworkElement(object):
             self.value = ''
     # define an __eq__ and __hash__ method so we can remove duplicates with set()
     def __eq__(self, other):
-        return self.macs.macslist[0].value==other.macs.macslist[0].value
+        return self.macs.macslist[0].key==other.macs.macslist[0].key
     def __hash__(self):
-        return hash(('mac', self.macs.macslist[0].value))
+        return hash(self.macs.macslist[0].key)
     def __init__(self,identifier):
         # the only property required on init is an id number
         self.id = identifier
@@ -463,6 +820,11 @@ class NetworkElement(object):
         self.typecrawled = False
         # make a flag to catch incomplete data pulls
         self.badpull = False
+        # attempt budgets for the data pulls and the discovery runs inside each
+        self.pullbudget = Backoff(nwConfig.maxpullattempts)
+        self.grabbudget = Backoff(nwConfig.discoveryAttempts)
+        # discovery profile the type is built with (see appendTypeToNE)
+        self.discoveryprofile = nwConfig.discoveryProfile
         self.hopcount = 0
         ##### Section to hold parent/child relationship discovery flags #######
         self.islowestchild = False
@@ -619,9 +981,245 @@ class NetworkElement(object):
 
 
 
+class NEList(list):
+    ''' Inherited from list type to hold the NetworkElement()
+    objects of a crawl. Keeps indexes of the NE's by id, by
+    chassis MAC (macslist[0]) and by interface IP so the
+    relationship code doesn't have to scan the whole list
+    for every lookup.
+
+    MAC keys come from mac_key() so the format of the MAC 
+    doesn't matter when looking it up.
+
+    Every way of adding or removing an NE goes through here
+    so the indexes stay current. NE's are indexed with the
+    values they have when they're added, the crawl only
+    appends NE's once they're completely built.
+
+    '''
+    def __init__(self,loo_ne=()):
+        list.__init__(self,loo_ne)
+        self.reindex()
+    def reindex(self):
+        ''' Throws away the indexes and rebuilds them from
+        the current contents.
+        '''
+        self.index_id = {}
+        self.index_mac = {}
+        self.index_ip = {}
+        for ne in self:
+            self._index(ne)
+    def _keys(self,ne):
+        ''' Returns the (index,key) pairs that ne is filed under.
+        '''
+        keys = [(self.index_id,ne.id)]
+        try:
+            mackey = ne.macs.macslist[0].key
+            if mackey != '':
+                keys.append((self.index_mac,mackey))
+        except (AttributeError,IndexError):
+            pass
+        try:
+            for interface in ne.type.interfaces.interfacelist:
+                if interface.address.value != '':
+                    keys.append((self.index_ip,interface.address.value))
+        except AttributeError:
+            pass
+        return keys
+    def _index(self,ne):
+        for index,key in self._keys(ne):
+            bucket = index.setdefault(key,[])
+            if not any(x is ne for x in bucket):
+                bucket.append(ne)
+    def _unindex(self,ne):
+        # an NE can be in the list more than once, only drop it
+        #  from the indexes when the last copy is gone
+        if any(x is ne for x in self):
+            return
+        for index,key in self._keys(ne):
+            bucket = [x for x in index.get(key,[]) if x is not ne]
+            if bucket:
+                index[key] = bucket
+            else:
+                index.pop(key,None)
+    def append(self,ne):
+        list.append(self,ne)
+        self._index(ne)
+    def extend(self,loo_ne):
+        for ne in loo_ne:
+            self.append(ne)
+    def __iadd__(self,loo_ne):
+        self.extend(loo_ne)
+        return self
+    def insert(self,i,ne):
+        list.insert(self,i,ne)
+        self._index(ne)
+    def pop(self,i=-1):
+        ne = list.pop(self,i)
+        self._unindex(ne)
+        return ne
+    def remove(self,ne):
+        ''' Same as list.remove() (first NE that compares equal,
+        i.e., same MAC) but keeps the indexes in line.
+        '''
+        self.pop(self.index(ne))
+    def __setitem__(self,i,ne):
+        if isinstance(i,slice):
+            ne = list(ne)
+        old = self[i]
+        list.__setitem__(self,i,ne)
+        self._unindex_all(old)
+        self._index_all(ne)
+    def __delitem__(self,i):
+        old = self[i]
+        list.__delitem__(self,i)
+        self._unindex_all(old)
+    def __setslice__(self,i,j,loo_ne):
+        self.__setitem__(slice(max(0,i),max(0,j)),loo_ne)
+    def __delslice__(self,i,j):
+        self.__delitem__(slice(max(0,i),max(0,j)))
+    def _index_all(self,ne_or_list):
+        if isinstance(ne_or_list,list):
+            for ne in ne_or_list:
+                self._index(ne)
+        else:
+            self._index(ne_or_list)
+    def _unindex_all(self,ne_or_list):
+        if isinstance(ne_or_list,list):
+            for ne in ne_or_list:
+                self._unindex(ne)
+        else:
+            self._unindex(ne_or_list)
+    def by_id(self,i):
+        ''' Returns the NE object with id == i or None
+        '''
+        try:
+            return self.index_id[i][0]
+        except KeyError:
+            return None
+    def by_mac(self,mac):
+        ''' Returns a list of the NE's whose chassis MAC is mac
+        '''
+        return list(self.index_mac.get(mac_key(mac),[]))
+    def by_ip(self,ip):
+        ''' Returns a list of the NE's with an interface
+        address of ip
+        '''
+        return list(self.index_ip.get(ip,[]))
+
+class TopologyGraph(object):
+    ''' Adjacency structure for the NE's of a crawl, keyed by NE id.
+    Links are undirected, remember the slotport at each end when
+    it's known and the kinds of data they were learned from
+    (e.g., 'amap', 'mac', 'route').
+
+    orient() gives every NE it reaches a single parent with a breadth 
+    first search away from a set of source NE's. add_parent(),
+    set_parent() and clear_parent() adjust single NE's afterwards (an
+    NE seen from more than one place can have more than one parent).
+    The parents/children lists on the NE's are generated from this.
+
+    '''
+    class Link(object):
+        def __init__(self):
+            self.kinds = set()
+            self.ports = {} # ne id -> slotport on that NE
+    def __init__(self):
+        self.nodes = {} # ne id -> NE
+        self.adjacency = {} # ne id -> OrderedDict(neighbour id -> Link)
+        self.parents = {} # ne id -> OrderedDict(parent ne id -> True)
+        self.children = {} # ne id -> OrderedDict(child ne id -> True)
+    def add_node(self,ne):
+        if ne.id not in self.nodes:
+            self.nodes[ne.id] = ne
+            self.adjacency[ne.id] = collections.OrderedDict()
+            self.parents[ne.id] = collections.OrderedDict()
+            self.children[ne.id] = collections.OrderedDict()
+    def remove_node(self,i):
+        ''' Drops the NE with id i along with its links and 
+        parent/child relationships.
+        '''
+        if i not in self.nodes:
+            return
+        self.clear_parent(i)
+        for child in self.children[i]:
+            del self.parents[child][i]
+        for neighbour in self.adjacency[i]:
+            del self.adjacency[neighbour][i]
+        del self.adjacency[i]
+        del self.parents[i]
+        del self.children[i]
+        del self.nodes[i]
+    def add_link(self,a,b,kind,aport=''):
+        ''' Links NE's a and b (adding to the existing link if there
+        is one). aport is a's slotport on the link if known.
+        '''
+        link = self.adjacency[a].get(b)
+        if link == None:
+            link = self.Link()
+            self.adjacency[a][b] = link
+            self.adjacency[b][a] = link
+        link.kinds.add(kind)
+        if aport != '':
+            link.ports[a] = aport
+        return link
+    def port(self,a,b):
+        ''' Returns a's slotport on the link to b or '' if unknown
+        '''
+        link = self.adjacency[a].get(b)
+        if link == None:
+            return ''
+        return link.ports.get(a,'')
+    def neighbours(self,i,kind=None):
+        return [n for n,link in self.adjacency[i].items()
+                if kind == None or kind in link.kinds]
+    def add_parent(self,child,parent):
+        self.parents[child][parent] = True
+        self.children[parent][child] = True
+    def set_parent(self,child,parent):
+        ''' Makes parent the only parent of child
+        '''
+        self.clear_parent(child)
+        self.add_parent(child,parent)
+    def clear_parent(self,child):
+        for parent in self.parents[child]:
+            del self.children[parent][child]
+        self.parents[child].clear()
+    def remove_parent(self,child,parent):
+        if parent in self.parents[child]:
+            del self.parents[child][parent]
+            del self.children[parent][child]
+    def has_parent(self,i):
+        return len(self.parents[i]) > 0
+    def parents_of(self,i):
+        return list(self.parents[i])
+    def children_of(self,i):
+        return list(self.children[i])
+    def orient(self,sources,kind=None):
+        ''' Breadth first search from the sources over links of kind.
+        Every NE reached gets the NE it was reached from as its parent,
+        the sources themselves are left alone. Returns the ids in the
+        order they were reached.
+        '''
+        visited = set(sources)
+        order = list(sources)
+        queue = collections.deque(sources)
+        while queue:
+            i = queue.popleft()
+            for n in self.neighbours(i,kind):
+                if n not in visited:
+                    visited.add(n)
+                    self.set_parent(n,i)
+                    order.append(n)
+                    queue.append(n)
+        return order
+
 class CrawlResults(object):
     ''' Used to store the results of a crawl. Eventually will have a
     dump to XML method that creates the output XML.
+
+    loo_ne is always an NEList, assigning a plain list to it
+    wraps it up and builds the indexes.
     '''
     def __init__(self,sourceTargetId):
         ''' Not sure if I want to split the crawls up into crawls per target
@@ -635,23 +1233,45 @@ class CrawlResults(object):
         self.loo_scratchpad = []
         self.realrootmac = ''
         self.textmap = [] # holds lines from the map view so it can be logged
-    def genxml(self):
-        x_root = ET.Element('root')
+        # parent/child relationships, built by the schemaModule's peckingOrder
+        self.topology = TopologyGraph()
+    def _get_loo_ne(self):
+        return self._loo_ne
+    def _set_loo_ne(self,loo_ne):
+        if isinstance(loo_ne,NEList):
+            self._loo_ne = loo_ne
+        else:
+            self._loo_ne = NEList(loo_ne)
+    loo_ne = property(_get_loo_ne,_set_loo_ne)
+    def genxml_ne(self,x_root):
+        ''' Appends the xml of every NE in the crawl to x_root.
+        '''
         for ne in self.loo_ne:
             try:
                 logging.debug("CrawlResults():\t\t Attempting .genxml() on NE with ID: " + ne.id)
                 x_root.append(ne.genxml())
             except Exception as e:
                 logging.debug("CrawlResults():\t\t Exception serializing xml for NE: " + str(e))
-        # now add the event log to end of XML:
-        x_root_eventlog = ET.SubElement(x_root,'eventlog')
-        for index,message in enumerate(werd.messagelog):
-            orderid = str(index+1)
-            x_root_eventlog_event = ET.SubElement(x_root_eventlog,'event',attrib={'id':orderid})
-            x_root_eventlog_event.text = message.dump()
+    def genxml(self):
+        x_root = ET.Element('root')
+        self.genxml_ne(x_root)
+        # now add the event log for this crawl's targets to end of XML:
+        werd.messagelog.genxml(x_root,self.idOfSourceTarget)
         #xmlstring = ET.dump(x_root)
         return(ET.tostring(x_root))
 
+def genxml_combined(loo_crawlresults):
+    ''' Builds one output XML out of several CrawlResults (one 
+    per target). NE ID's are handed out by werd so they're unique
+    across every crawl and the NE's just go in one after another
+    followed by a single event log.
+    '''
+    x_root = ET.Element('root')
+    for crawl in loo_crawlresults:
+        crawl.genxml_ne(x_root)
+    werd.messagelog.genxml(x_root)
+    return(ET.tostring(x_root))
+
 
 class ExpectGenerator(object):
     ''' used to build an expect script based on inputs
@@ -29,13 +29,124 @@ defaultSSHPort = '22'
 
 # LOCAL OS PATH SUPPORT
 expectPrefix = '/usr/bin/expect'
+sshPrefix = '/usr/bin/ssh'
+
+''' transport picks how pulls are run. 'expect' shells out to the
+expect scripts for every pull. 'pty' drives ssh directly from the 
+nwTransport reactor thread using the same login/prompt dialogue. 
+'''
+transport = 'expect'
+
+''' with the pty transport, transportReuse keeps sessions open after
+a pull so the discovery can reuse the primer's login and siblings 
+behind the same jump host can reuse the jump host login. At most
+transportMaxIdle sessions are parked at once (and no more than
+maxSessionsPerJumpHost behind any one jump host) and a parked session
+older than transportIdleTimeout seconds is not reused.
+'''
+transportReuse = True
+transportMaxIdle = 32
+transportIdleTimeout = 120
+
+''' with the pty transport, transportTunnels logs in to each jump host
+once and starts hop 1/hop 2 sessions over that connection (OpenSSH
+-M/-S connection sharing) instead of logging in to the jump host 
+again for every device behind it.
+'''
+transportTunnels = True
+
+''' with the pty transport, streamDiscovery hands the discovery output
+to the schemaModule line by line so each command's section is parsed
+as soon as the next command shows up and the full transcript is 
+never held in memory (it still goes to the -output.log file).
+'''
+streamDiscovery = True
+
+''' when True the parse stages run in a pool of parseProcesses worker
+processes (None means one per cpu). Only the raw section text goes
+over and only the parsed properties come back, the NE type objects 
+are still built in the crawl. False parses on the crawl thread.
+'''
+parseInProcesses = True
+parseProcesses = None
+
+''' earlyAbort watches the output of every pull (expect or pty) for the 
+schemaModule's transportFailureWatch markers and kills the session the
+moment one shows up instead of waiting out the rest of the timeouts.
+'''
+earlyAbort = True
 
 #define a long banner string when we run an OS command
 #declaring here saves space in the rest of the code
 rob = "=-=-=-=-=- RUNNING OS COMMAND =-=-=-=-=-: "
 
-# define sleep time in seconds between expect SSH attempts
-expectSleep = 20
+''' when a device says it isn't ready (or sends back short output) its
+entry is parked and retried later instead of stalling the crawl. The
+first wait is retryBaseDelay seconds and doubles on every retry up to
+retryMaxDelay, with jitter so parked devices don't all retry at once.
+'''
+retryBaseDelay = 5
+retryMaxDelay = 60
+
+''' attempt budgets for a single device. primerAttempts is the number
+of primer runs per entrypoint and discoveryAttempts the number of 
+discovery runs in each data pull (see maxpullattempts).
+'''
+primerAttempts = 5
+discoveryAttempts = 7
+
+# CONCURRENCY SUPPORT
+''' when True every entrypoint gets a quick TCP connect to its SSH port
+before priming and the ones that don't answer within sweepTimeout 
+seconds are skipped. Connects are started sweepBatch at a time.
+'''
+reachabilitySweep = True
+sweepTimeout = 2
+sweepBatch = 256
+
+''' number of worker threads primerBrain uses to prime entrypoints
+in parallel. Each worker drives its own expect process so this is 
+also the max number of simultaneous primer logins. Set to 1 to go 
+back to priming one entrypoint at a time.
+'''
+primerWorkers = 8
+
+''' number of worker threads used to run the discovery pulls once
+the entrypoints are primed. 
+'''
+discoveryWorkers = 4
+
+''' hop 1 and hop 2 entrypoints ride on top of the same jump host
+session so this caps how many expect sessions may be open through
+any single jump host at the same time. 
+'''
+maxSessionsPerJumpHost = 2
+
+''' when True burrow() runs the crawl as a work queue so new 
+entrypoints found in the AMAP tables get primed while the rest of
+the current hop depth is still being pulled and parsed. 
+pipelineWorkers is the number of entrypoints worked at once.
+'''
+pipelinedCrawl = False
+pipelineWorkers = 8
+
+''' number of targets from the input XML crawled at once, each with 
+its own CrawlResults. Set to 1 to crawl the targets one after another.
+'''
+targetWorkers = 4
+
+''' when True each target's results go to their own output XML named
+after the --outputfile plus the target id (e.g., output-1.xml) instead
+of one combined XML. Each file only gets the events from its own
+target's crawl. Same as --splitoutput.
+'''
+outputPerTarget = False
+
+''' number of distinct mac strings (and mac integers) whose parsed
+(and formatted) form is remembered by nwClasses.parse_mac() and
+format_mac(). The caches are emptied when they grow past this.
+'''
+macCacheSize = 65536
 
 # MODULE SUPORT
 ''' schemaModule defines which python module we'll use to parse
@@ -58,6 +169,14 @@ schemaModule.genExpect_Discovery()
 before abandoning'''
 maxpullattempts = 4
 
+''' the default discovery profile (see discoveryProfiles in the type
+module). 'full' runs every discovery command, 'topology' only the ones
+the amap links and parent/child relationships are built from. Can be
+set per target with the profile attribute in the input XML or for the
+whole run with --profile.
+'''
+discoveryProfile = 'full'
+
 # default file to dump pickled crawl results
 defaultcrawlresultspicklefile = 'crawlresults.pkl'
 
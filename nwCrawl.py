@@ -22,6 +22,10 @@ import inspect
 import gc
 import getpass
 import copy
+import errno
+import select
+import socket
+import threading
 
 import xml.etree.ElementTree as ET
 
@@ -29,6 +33,8 @@ import xml.etree.ElementTree as ET
 from nwClasses import werd # super important that this is first
 import nwConfig
 import nwClasses
+import nwTransport
+import nwOUIexplorer
 
 
 # now test to see if we can load a schemaModule for vendor specific parsing
@@ -42,7 +48,25 @@ except Exception as e:
     dingding = nwClasses.Event(msgtext,"top of nwCrawl",True,True)
     sys.exit()
 
+''' auth possibility scores live on the shared target.authlist so any
+changes to them have to be serialized when entrypoints are primed
+from multiple WorkerPool threads.
+'''
+authlock = threading.RLock()
 
+''' hop 1 and hop 2 entries all log in through the same jump host
+so we keep one semaphore per jump host IP to cap how many sessions
+we stack on top of it at once (see nwConfig.maxSessionsPerJumpHost).
+'''
+jumphostlock = threading.Lock()
+jumphostslots = {}
+
+''' discovery expect scripts are shared by every NE of the same type,
+discovery profile and hop count (see buildExpectScript) so they're 
+only written once.
+'''
+expectscriptlock = threading.Lock()
+expectscripts = {}
 
 
 def giveupthefunc():
@@ -84,6 +108,103 @@ def runoscommand(commandstringraw,subool=None):
     else:
         # make sure we're returning a list
         return os.popen(commandstringraw).readlines()
+
+def jumpHostIp(entry):
+    ''' Returns the IP of the jump host (hop 0) that an entry
+    will be reached through or None if the entry is reached
+    directly.
+    '''
+    if not entry.directfailed or entry.hopcount < 1:
+        return None
+    hop = entry
+    for i in range(0,entry.hopcount):
+        if hop.learnedfromEntryObj == None:
+            break
+        hop = hop.learnedfromEntryObj
+    if hop is entry:
+        return None
+    return hop.ip
+
+def runThroughJumpHost(entry,commandstringraw,dialogue=None,online=None):
+    ''' Runs an OS command for the entry but waits for a free 
+    session slot first if the entry is behind a jump host.
+    If a transport dialogue is passed in it is run by nwTransport
+    instead of the OS command. If online is passed as well each
+    line is handed to it as it comes in and nothing is returned.
+
+    With nwConfig.earlyAbort the run is cut short as soon as the
+    output shows it failed and the nwTransport.Failure is left in
+    entry.failure (None when the run went clean).
+    '''
+    myfunc = str(giveupthefunc())
+    def runner():
+        if dialogue != None and online != None:
+            for line in nwTransport.streamDialogue(dialogue):
+                online(line)
+            entry.failure = dialogue.failure
+            return []
+        if dialogue != None:
+            output = nwTransport.runDialogue(dialogue)
+            entry.failure = dialogue.failure
+            return output
+        if nwConfig.earlyAbort:
+            (output,entry.failure) = nwTransport.watchCommand(commandstringraw,
+                schemaModule.transportFailureWatch)
+            return output
+        entry.failure = None
+        return runoscommand(commandstringraw)
+    jumpip = jumpHostIp(entry)
+    if jumpip == None:
+        return runner()
+    with jumphostlock:
+        if jumpip not in jumphostslots:
+            jumphostslots[jumpip] = threading.BoundedSemaphore(
+                max(1,nwConfig.maxSessionsPerJumpHost))
+        slot = jumphostslots[jumpip]
+    logging.debug(myfunc + '\t' +
+        "Waiting for session slot on jump host: " + jumpip)
+    with slot:
+        return runner()
+
+def buildTransportLegs(entry):
+    ''' Builds the (ip,port,username,password) list for each hop
+    the same way buildExpectCommand() lays out the expect 
+    arguments. Must be run after buildExpectCommand() so the 
+    entry.hopcount is already settled.
+    '''
+    legs = []
+    hop = entry
+    authobj = entry.authobj
+    for i in range(0,entry.hopcount + 1):
+        legs.insert(0,(hop.ip,hop.port,authobj.username,authobj.password))
+        authobj = hop.learnedfromAuthObj
+        hop = hop.learnedfromEntryObj
+    return legs
+
+def buildTransportDialogue(entry,ne=None):
+    ''' Returns the nwTransport Dialogue for the primer (or the
+    discovery if ne is passed) or None when nwConfig.transport
+    says to stick with the expect scripts.
+    '''
+    myfunc = str(giveupthefunc())
+    if nwConfig.transport != 'pty':
+        return None
+    try:
+        legs = buildTransportLegs(entry)
+        timeout = schemaModule.primerExpectTimeout
+        if ne is None:
+            dialogue = schemaModule.genTransportDialogue_Primer(legs,timeout)
+        else:
+            dialogue = schemaModule.genTransportDialogue_Discovery(ne,legs,timeout)
+        if not nwConfig.earlyAbort:
+            dialogue.watch = None
+        return dialogue
+    except Exception as ex_dialogue:
+        logging.debug(myfunc + '\t' +
+            "Exception building transport dialogue, falling back to expect: " + 
+            str(ex_dialogue))
+        return None
+
 '''
 def buildExpectCommand(ne):
     # Takes an NE and builds the expect script launch
@@ -299,56 +420,58 @@ def adjustAuth(target,entry,purgecurrent):
         logging.debug(sortmsg)
         return allauths
 
-    # if instructed to purge current, append current auth to authfailed list
-    if purgecurrent:
-        entry.authfailed.append(entry.auth)
-    logging.debug(myfunc + '\t' + 
-        "starting adjustAuth alorigthm for Entry with ID: "+ entry.id + 
-        ". Old auth id = " + entry.auth)
-    allauths = []
-    # first build list of authpossibilities
-    for authposs in target.authlist:
-        allauths.append(authposs.id)
-    # now take list of all auths and sort by score
-    allauths = sortbyweight(allauths)
-    numtotalauths = str(len(allauths))
-    logging.debug(myfunc + '\t' +
-        "have list of auth possibilities length: " + numtotalauths)
-    # now clean out all auths from authlist that have previously failed 
-    if len(entry.authfailed) > 0:
-        for failed in entry.authfailed:
-            try:
-                allauths.remove(failed)
-            except:
-                logging.debug(myfunc + '\t' + "Could not find: " + failed)
-    try:
-        logging.debug(myfunc + '\t' + "Now have allauths content of: " +
-            str(allauths))
-    except:
-        logging.debug(myfunc + '\t' + "Failure pulling allauths contents, may be empty...")
-    # check to see if there are any entries left in allauths
-    if len(allauths) >= 1:
-        # now pop the auth off the end of the list since it's the highest weighted
-        entry.auth = allauths.pop()
-        for o in target.authlist:
-            if o.id == entry.auth:
-                logging.debug(myfunc + '\t' +
-                    "Choosing new auth ID: " + o.id + ", with Score: " + str(o.score))
-        # now that allauths is clean from known-bad auths, reverse list and pop first entry
+    # the auth scores are shared by every entrypoint in the target
+    with authlock:
+        # if instructed to purge current, append current auth to authfailed list
+        if purgecurrent:
+            entry.authfailed.append(entry.auth)
+        logging.debug(myfunc + '\t' + 
+            "starting adjustAuth alorigthm for Entry with ID: "+ entry.id + 
+            ". Old auth id = " + entry.auth)
+        allauths = []
+        # first build list of authpossibilities
+        for authposs in target.authlist:
+            allauths.append(authposs.id)
+        # now take list of all auths and sort by score
+        allauths = sortbyweight(allauths)
+        numtotalauths = str(len(allauths))
         logging.debug(myfunc + '\t' +
-            "New auth ID = " + entry.auth)
-    else:
-        # need to log an xml error to notify user that we ran out of authpossibilities
-        msgtext = ("Cycled through " + numtotalauths + " auth possibilities and found none " +
-            "that work for Entry with ID: " + entry.id + ", IP: " + entry.ip)
-        dingding = nwClasses.Event(msgtext,myfunc,False,True)
-        # also flag entry as totally unreachable
-        entry.reachable = False
-    # finally, append the actual authobj to the entrypoint
-    for auth in target.authlist:
-        if auth.id == entry.auth:
-            entry.authobj = auth
-    return entry
+            "have list of auth possibilities length: " + numtotalauths)
+        # now clean out all auths from authlist that have previously failed 
+        if len(entry.authfailed) > 0:
+            for failed in entry.authfailed:
+                try:
+                    allauths.remove(failed)
+                except:
+                    logging.debug(myfunc + '\t' + "Could not find: " + failed)
+        try:
+            logging.debug(myfunc + '\t' + "Now have allauths content of: " +
+                str(allauths))
+        except:
+            logging.debug(myfunc + '\t' + "Failure pulling allauths contents, may be empty...")
+        # check to see if there are any entries left in allauths
+        if len(allauths) >= 1:
+            # now pop the auth off the end of the list since it's the highest weighted
+            entry.auth = allauths.pop()
+            for o in target.authlist:
+                if o.id == entry.auth:
+                    logging.debug(myfunc + '\t' +
+                        "Choosing new auth ID: " + o.id + ", with Score: " + str(o.score))
+            # now that allauths is clean from known-bad auths, reverse list and pop first entry
+            logging.debug(myfunc + '\t' +
+                "New auth ID = " + entry.auth)
+        else:
+            # need to log an xml error to notify user that we ran out of authpossibilities
+            msgtext = ("Cycled through " + numtotalauths + " auth possibilities and found none " +
+                "that work for Entry with ID: " + entry.id + ", IP: " + entry.ip)
+            dingding = nwClasses.Event(msgtext,myfunc,False,True)
+            # also flag entry as totally unreachable
+            entry.reachable = False
+        # finally, append the actual authobj to the entrypoint
+        for auth in target.authlist:
+            if auth.id == entry.auth:
+                entry.authobj = auth
+        return entry
 
 def adjustAuthScore(target,entry,successbool):
     ''' Takes an entry's successful authentication method
@@ -358,28 +481,30 @@ def adjustAuthScore(target,entry,successbool):
     '''
     myfunc = str(giveupthefunc())
     logging.debug("adjustAuthScore:: Adjusting Entry ID: " + entry.id + ", Auth ID: " + entry.auth)
-    for authposs in target.authlist:
-        if authposs.id == entry.auth:
-            if successbool:
-                authposs.score += 1
-                logging.debug("adjustAuthScore:: Increasing authposs score. New Value: " + str(authposs.score))
-            elif not successbool:
-                authposs.score -= 1
-                logging.debug("adjustAuthScore:: Decreasing authposs score. New Value: " + str(authposs.score))
-        logging.debug("adjustAuthScore::" + '\t\t' + "Auth ID: " + authposs.id + ", Score: " + str(authposs.score))
-
-def sleeper():
-    ''' Sleeps for time specified in nwConfig.expectSleep then
-    resubmits same Entry back to primerDriver
+    with authlock:
+        for authposs in target.authlist:
+            if authposs.id == entry.auth:
+                if successbool:
+                    authposs.score += 1
+                    logging.debug("adjustAuthScore:: Increasing authposs score. New Value: " + str(authposs.score))
+                elif not successbool:
+                    authposs.score -= 1
+                    logging.debug("adjustAuthScore:: Decreasing authposs score. New Value: " + str(authposs.score))
+            logging.debug("adjustAuthScore::" + '\t\t' + "Auth ID: " + authposs.id + ", Score: " + str(authposs.score))
+
+def startParsing():
+    ''' Gets the schemaModule's parse pool going (if it has one)
+    before any crawl threads are started.
     '''
-    myfunc = str(giveupthefunc())
-    sleeptime = nwConfig.expectSleep
-    logging.debug(myfunc + '\t' +
-        "Sleeping " + str(sleeptime) + " seconds...")
-    time.sleep(sleeptime)
-    #logging.debug(myfunc + '\t' + 
-        #"Resubmitting Entry ID " + entry.id + " back to primerDriver...")
-    #primerDriver(target,entry)
+    if hasattr(schemaModule,'startParsePool'):
+        schemaModule.startParsePool()
+
+def stopParsing():
+    ''' Shuts down the schemaModule's parse pool once the crawls
+    are done.
+    '''
+    if hasattr(schemaModule,'stopParsePool'):
+        schemaModule.stopParsePool()
 
 def delete_ssh_keys():
     ''' Deletes the current profile's ~/.ssh/known_hosts keys
@@ -403,29 +528,32 @@ def primerDriver(target,entry):
     ''' This function takes the primer commands and runs them.
     If they fail for timeouts or bad passwords it handles
     all of that tweaking until the primer commands work. 
+
+    Every run counts against entry.primerbudget. If the device
+    says it isn't ready entry.retryafter is set to the backoff 
+    delay and the function returns so the caller can park it.
     '''
     myfunc = str(giveupthefunc())
     logging.debug(myfunc + '\t' + 
         "Entering primerDriver function...about to build and run oscommands")
     # first check to see if entry is reachable
     # also check to make sure not re-running if primer was successful
-    counter = 0
-    ####################while not entry.primersuccess:
-    failed = False
     while not entry.primersuccess:
-        # put a little saftey in there
-        counter += 1
-        if counter > 5:
-            break
         # keep running until primersuccess
         if entry.reachable or entry.primersuccess or entry.directfailed:
+            if not entry.primerbudget.attempt():
+                logging.debug(myfunc + '\t' +
+                    "Used up all " + str(entry.primerbudget.budget) + 
+                    " primer attempts for Entry ID: " + entry.id)
+                break
             # first run adjust auth to see choose best auth
             purgecurrentbool = False
             entry = adjustAuth(target,entry,purgecurrentbool)
             # build expect command knowing we want the primer
             bool_useprimer = True
             buildExpectCommand(entry,bool_useprimer)
-            entry.primeroutput = runoscommand(entry.primercommand)
+            entry.primeroutput = runThroughJumpHost(entry,entry.primercommand,
+                buildTransportDialogue(entry))
             sleepandtryagain = False
             poutput = ''.join(entry.primeroutput)
 
@@ -467,6 +595,9 @@ def primerDriver(target,entry):
                 delete_ssh_keys()
             elif not entry.reachable:
                 if directmightfail:
+                    if not entry.directfailed:
+                        # going through the jump host gets its own budget
+                        entry.primerbudget.reset()
                     entry.directfailed = True
                 else:
                     msgtext = ("Entrypoint IP Unreachable: ( ID: " + entry.id +
@@ -495,10 +626,11 @@ def primerDriver(target,entry):
                 purgecurrentbool = True
                 entry = adjustAuth(target,entry,purgecurrentbool)
             elif sleepandtryagain:
-                msgtext = ("NE not ready. Sleeping " + str(nwConfig.expectSleep) +
-                    " seconds.")
+                entry.retryafter = entry.primerbudget.delay()
+                msgtext = ("NE not ready. Retrying Entry ID: " + entry.id + " in " + 
+                    str(int(entry.retryafter)) + " seconds.")
                 dingding = nwClasses.Event(msgtext,myfunc,False,True)
-                sleeper()
+                break
             elif entry.reachable and authsuccess:
                 # must mean primer was successful
                 entry.primersuccess = True
@@ -514,47 +646,163 @@ def primerDriver(target,entry):
                         dingding = nwClasses.Event(msgtext,myfunc,False,True)
         # not reachable or primer success means no need to attempt again.
         else:
-            pass
+            break
     logging.debug(myfunc + '\t' +
         "Leaving primerDriver with Entry ID: " + entry.id +
         ", Auth ID: " + entry.auth)
     return entry
 
+def primeEntry(target,entry,idx=None):
+    ''' Cycles a single entrypoint through primerDriver until we
+    get either a reachable false or a primersuccess true. Only the
+    entry's own properties are changed (auth scores are protected 
+    by authlock) so this is safe to run from a WorkerPool thread.
+
+    If the device asks us to wait a nwClasses.Retry is returned 
+    instead so the WorkerPool can park the entry and work on other
+    entries. Calling primeEntry again picks up where it left off.
+    '''
+    myfunc = str(giveupthefunc())
+    if idx == None:
+        idx = target.entrypointlist.index(entry)
+    logging.debug(myfunc + '\t' +
+        "\t\t\t\t\t\t{}{}{}{}{}{}{}{}{}  PRIMERBRAIN WORKING ON ENTRYPOINT " + 
+        str(idx+1) + " of " + str(len(target.entrypointlist)) + 
+        "   {}{}{}{}{}{}{}{}{}")
+    # create a flag to let the loop know when to stop
+    #  working on the entry
+    entryfinished = False
+    while not entryfinished:
+        logging.debug(myfunc + '\t' +
+            "At start of burrow while loop: \n" + entry.dumpdata())
+        # cycle through primerDriver until get a reachable false or primersuccess true
+        entry.retryafter = None
+        if entry.reachable:
+            entry = primerDriver(target,entry)
+        if entry.retryafter == None and not entry.reachable and entry.directfailed:
+            entry = primerDriver(target,entry)
+        if entry.retryafter != None:
+            return nwClasses.Retry(entry.retryafter)
+        if entry.primersuccess == False and entry.reachable == True:
+            entryfinished = entry.primerbudget.exhausted()
+        elif entry.primersuccess == True and entry.reachable == True:
+            entryfinished = True
+        elif entry.primersuccess == False and entry.reachable == False:
+            if entry.directfailed:
+                entryfinished = entry.primerbudget.exhausted()
+            else:
+                entryfinished = True
+        logging.debug(myfunc + '\t' +
+            "At end of burrow while loop: \n" + entry.dumpdata())
+        time.sleep(2)
+    return entry
+
+def tcpSweep(loo_entries):
+    ''' Starts a non-blocking TCP connect to the port of every 
+    entry at once and waits up to nwConfig.sweepTimeout seconds 
+    for them to finish. Returns a dict of id(entry) to True if the
+    port answered.
+    '''
+    myfunc = str(giveupthefunc())
+    results = {}
+    pending = {}
+    for entry in loo_entries:
+        results[id(entry)] = False
+        sock = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+        sock.setblocking(0)
+        try:
+            err = sock.connect_ex((entry.ip,int(entry.port)))
+        except Exception as ex_connect:
+            logging.debug(myfunc + '\t' +
+                "Exception connecting to " + entry.ip + ": " + str(ex_connect))
+            err = -1
+        if err in (errno.EINPROGRESS,errno.EWOULDBLOCK,errno.EALREADY):
+            pending[sock.fileno()] = (sock,entry)
+            continue
+        results[id(entry)] = (err == 0)
+        sock.close()
+    deadline = time.time() + nwConfig.sweepTimeout
+    while len(pending) > 0 and time.time() < deadline:
+        try:
+            r,writable,x = select.select([],pending.keys(),[],
+                                max(0,deadline - time.time()))
+        except select.error as ex_select:
+            if ex_select.args[0] == errno.EINTR:
+                continue
+            raise
+        for fd in writable:
+            sock,entry = pending.pop(fd)
+            # a refused connection also shows up as writable
+            err = sock.getsockopt(socket.SOL_SOCKET,socket.SO_ERROR)
+            results[id(entry)] = (err == 0)
+            sock.close()
+    for sock,entry in pending.values():
+        sock.close()
+    return results
+
+def reachabilitySweep(loo_entries):
+    ''' Quick check of which entrypoints answer on their SSH port
+    before any expect timeouts are spent on them. Entries that 
+    don't answer are flagged unreachable so primeEntry skips them.
+
+    Entries learned from another NE are often only routable from
+    that NE so they are never flagged. Instead they go straight 
+    to the jump host route primerDriver would fall back to anyway.
+    Entries already on the jump host route aren't checked.
+    '''
+    myfunc = str(giveupthefunc())
+    loo_sweep = [e for e in loo_entries if e.reachable and not e.primersuccess
+                    and not e.directfailed]
+    if len(loo_sweep) == 0:
+        return
+    logging.debug(myfunc + '\t' +
+        "Sweeping " + str(len(loo_sweep)) + " entrypoints for reachability...")
+    results = {}
+    for i in range(0,len(loo_sweep),nwConfig.sweepBatch):
+        results.update(tcpSweep(loo_sweep[i:i + nwConfig.sweepBatch]))
+    deadcount = 0
+    for entry in loo_sweep:
+        if results.get(id(entry)):
+            continue
+        if entry.learnedfromEntryObj != None and entry.hopcount > 0:
+            logging.debug(myfunc + '\t' +
+                "Entry ID: " + entry.id + " with IP: " + entry.ip + 
+                " not directly reachable. Going through hop " + str(entry.hopcount) + " instead.")
+            entry.hopcount_saved = entry.hopcount
+            entry.directfailed = True
+        else:
+            msgtext = ("Entrypoint IP failed reachability sweep: ( ID: " + entry.id +
+                        ", IP: " + entry.ip + ", PORT: " + entry.port + 
+                        ") No further attempts will be made on this entrypoint.")
+            dingding = nwClasses.Event(msgtext,myfunc,False,True)
+            entry.reachable = False
+            deadcount += 1
+    msgtext = ("Reachability sweep found " + str(deadcount) + " of " + 
+        str(len(loo_sweep)) + " entrypoints unreachable")
+    dingding = nwClasses.Event(msgtext,myfunc,False,True)
+
 def primerBrain(target):
     ''' This function orchestrates the functions of the
     initial primer functions. It cycles through the 
     entrypoints and kicks off the primer and learns the
     best authentication to use. 
+
+    The entrypoints are primed by a WorkerPool of up to
+    nwConfig.primerWorkers threads. Every entrypoint is only
+    handled by one worker at a time so the per-entry state 
+    (authfailed, directfailed, primersuccess, etc.) never gets
+    shared between workers. Entries that have to wait are parked
+    by the pool while the others carry on, even with one worker.
     '''
     myfunc = str(giveupthefunc())
+    numworkers = max(1,min(nwConfig.primerWorkers,len(target.entrypointlist)))
+    logging.debug(myfunc + '\t' +
+        "Priming " + str(len(target.entrypointlist)) + 
+        " entrypoints with " + str(numworkers) + " workers...")
+    pool = nwClasses.WorkerPool(numworkers,'primerBrain')
     for idx,entry in enumerate(target.entrypointlist):
-        # create a flag to let the loop know when to stop
-        #  working on the entry
-        logging.debug(myfunc + '\t' +
-            "\t\t\t\t\t\t{}{}{}{}{}{}{}{}{}  PRIMERBRAIN WORKING ON ENTRYPOINT " + 
-            str(idx+1) + " of " + str(len(target.entrypointlist)) + 
-            "   {}{}{}{}{}{}{}{}{}")
-        entryfinished = False
-        while not entryfinished:
-            logging.debug(myfunc + '\t' +
-                "At start of burrow while loop: \n" + entry.dumpdata())
-            # cycle through primerDriver until get a reachable false or primersuccess true
-            if entry.reachable:
-                entry = primerDriver(target,entry)
-            if not entry.reachable and entry.directfailed:
-                entry = primerDriver(target,entry)
-            if entry.primersuccess == False and entry.reachable == True:
-                entryfinished = False
-            elif entry.primersuccess == True and entry.reachable == True:
-                entryfinished = True
-            elif entry.primersuccess == False and entry.reachable == False:
-                if entry.directfailed:
-                    entryfinished = False
-                else:
-                    entryfinished = True
-            logging.debug(myfunc + '\t' +
-                "At end of burrow while loop: \n" + entry.dumpdata())
-            time.sleep(2)
+        pool.submit(primeEntry,target,entry,idx)
+    pool.join()
 
 
 
@@ -586,6 +834,7 @@ def createBaseNE(target,entry):
     # also, since we know this NE came from an entrypoint, set that property
     temp_ne.sourceEntryId.value = entry.id
     temp_ne.sourceEntryObj = entry
+    temp_ne.discoveryprofile = target.profile
     for auth in target.authlist:
         if auth.id == entry.auth:
             # appends the auth possibility object to the NE
@@ -600,15 +849,15 @@ def createBaseNE(target,entry):
     logging.debug(myfunc + "\t" + temp_ne.dump_basic_multiline())
     return temp_ne
 
-def buildExpectScript(ne):
-    ''' takes a block of body text and generates a .sh file
-    storing it in current directory. Returns the filename 
-    of the expect script.
+def buildDiscoveryLogName(ne):
+    ''' Builds the unique name (hostnames of every hop plus a 
+    random block) that the NE's discovery output log is named
+    after.
     '''
     myfunc = str(giveupthefunc())
     alreadygeneratedfilename = False
     try:
-        filename = 'expect---' + werd.randomNumberBlock() + "---" + ne.hostname.value + '.sh'
+        filename = 'expect---' + werd.randomNumberBlock() + "---" + ne.hostname.value
         try:
             if not alreadygeneratedfilename:
                 #if ne.sourceEntryObj.learnedfromEntryObj.learnedfromEntryObj.hostname != None:
@@ -617,7 +866,7 @@ def buildExpectScript(ne):
                             werd.randomNumberBlock() + "---" + 
                             ne.sourceEntryObj.learnedfromEntryObj.learnedfromEntryObj.hostname + "---" +
                             ne.sourceEntryObj.learnedfromEntryObj.hostname + "---" +
-                            ne.hostname.value + '.sh')
+                            ne.hostname.value)
                     alreadygeneratedfilename = True
         except Exception as eee:
             logging.debug(myfunc + '\t' +
@@ -629,7 +878,7 @@ def buildExpectScript(ne):
                     filename = ('expect---' + 
                             werd.randomNumberBlock() + "---" + 
                             ne.sourceEntryObj.learnedfromEntryObj.hostname + "---" +
-                            ne.hostname.value + '.sh')
+                            ne.hostname.value)
                     alreadygeneratedfilename = True
         except Exception as eee:
             logging.debug(myfunc + '\t' +
@@ -637,81 +886,142 @@ def buildExpectScript(ne):
     except Exception as e:
         logging.debug(myfunc + '\t' + "Exception building filename: " + str(e))
         if not alreadygeneratedfilename:
-            filename = 'expect---' + werd.randomNumberBlock() + '---UNKNOWNHOST.sh'
+            filename = 'expect---' + werd.randomNumberBlock() + '---UNKNOWNHOST'
             alreadygeneratedfilename = True
-    body = schemaModule.genExpect_Discovery(ne)
+    return filename
 
-    logging.debug(myfunc + '\t' +
-        "Attempting to open filename: " + filename + ". For writing...")
-    with open(filename,'wb') as f:
-        f.write(body)
+def buildExpectScript(ne):
+    ''' Returns the filename of the discovery expect script for 
+    the NE. Everything device specific comes in through argv so
+    there is one script per NE type, profile and hop count. It is written
+    to the current directory the first time it's needed and 
+    reused by every pull after that.
+
+    Also names the NE's discovery output log if it doesn't have
+    a name yet.
+    '''
+    myfunc = str(giveupthefunc())
+    if ne.type.nox_discoverylogname == '':
+        ne.type.nox_discoverylogname = buildDiscoveryLogName(ne)
+    hopcount = 0
+    if ne.sourceEntryObj != None and ne.sourceEntryObj.hopcount in (1,2):
+        hopcount = ne.sourceEntryObj.hopcount
+    key = (ne.typestring,ne.type.nox_discoveryprofile,hopcount)
+    with expectscriptlock:
+        filename = expectscripts.get(key)
+        if filename != None and os.path.exists(filename):
+            return filename
+        filename = ('expect---discovery---' + ne.typestring + '---' + 
+            ne.type.nox_discoveryprofile + '---hop' + str(hopcount) + '.sh')
+        body = schemaModule.genExpect_Discovery(ne)
+        logging.debug(myfunc + '\t' +
+            "Attempting to open filename: " + filename + ". For writing...")
+        with open(filename,'wb') as f:
+            f.write(body)
+        expectscripts[key] = filename
     return filename
 
 def buildAdvancedNE(basic_ne):
     ''' Takes a base NE and orchestrates the functions required
     to add more advanced data. 
+
+    The pulls count against the NE's pullbudget and the discovery
+    runs inside each pull against its grabbudget. If the device 
+    asks us to wait a nwClasses.Retry is returned instead of the
+    NE so the WorkerPool can park it and work on other NE's. 
+    Calling buildAdvancedNE again picks up where it left off.
     '''
     myfunc = str(giveupthefunc())
     def dataGrabber(ne):
-        finished = False
-        counter = 0
-        maxattempts = 7
-        while not finished:
-            counter += 1
-            if counter > maxattempts:
-                logging.debug("dataGrabber(): Maxattempts of "+str(maxattempts)+" reached")
-                break
+        ''' Runs the discovery until the output looks usable. 
+        Returns None when done or the number of seconds to wait
+        before trying again.
+        '''
+        while ne.grabbudget.attempt():
+            # first thing we want to do is build the expect script to do discovery
+            bool_useprimer = False
+            logging.debug(myfunc + '\t' + "attempting to build temp_ne discovery expect script from body...")
+            ne.type.nox_discoveryexpectscript = buildExpectScript(ne)
+            logging.debug(myfunc + '\t' + "attempting to build temp_ne discovery expect command from NE info...")
+            ne.type.nox_discoveryexpectcommand = buildExpectCommand(ne.sourceEntryObj,bool_useprimer,ne)
             logging.debug(myfunc + '\t' + "attempting to run temp_ne discovery expect script...")
-            ne.type.nox_discoveryoutput = runoscommand(ne.type.nox_discoveryexpectcommand)
-            
-            (reachable,
-                authsuccess,
-                sleepandtryagain,
-                deletesshkeys) = schemaModule.outputInspector(ne.type.nox_discoveryoutput)
-            if deletesshkeys:
+            dialogue = buildTransportDialogue(ne.sourceEntryObj,ne)
+            stream = None
+            if nwConfig.streamDiscovery and dialogue != None:
+                stream = schemaModule.genDiscoveryStream(ne)
+            if stream != None:
+                # split and parse the output as it comes in instead of holding it all
+                ne.type.nox_discoveryoutput = runThroughJumpHost(ne.sourceEntryObj,
+                    ne.type.nox_discoveryexpectcommand,dialogue,stream.feed)
+                stream.close()
+                ne.type.nox_discoverystream = stream
+                (reachable,
+                    authsuccess,
+                    sleepandtryagain,
+                    deletesshkeys) = stream.inspect()
+                outputlength = stream.linecount
+            else:
+                ne.type.nox_discoverystream = None
+                ne.type.nox_discoveryoutput = runThroughJumpHost(ne.sourceEntryObj,
+                    ne.type.nox_discoveryexpectcommand,dialogue)
+                (reachable,
+                    authsuccess,
+                    sleepandtryagain,
+                    deletesshkeys) = schemaModule.outputInspector(ne.type.nox_discoveryoutput)
+                outputlength = len(ne.type.nox_discoveryoutput)
+            failure = ne.sourceEntryObj.failure
+            if failure != None:
+                logging.debug(myfunc + '\t' +
+                    "Discovery pull ended early on failure: " + str(failure))
+            if failure != None and failure.fatal:
+                msgtext = ("Discovery pull for NE ID: " + str(ne.id) + " failed with '" +
+                    str(failure) + "'. No further attempts will be made.")
+                dingding = nwClasses.Event(msgtext,myfunc,False,True)
+                return None
+            elif deletesshkeys:
                 msgtext = "Bad SSH hostkeys detected, deleting known_hosts..."
                 dingding = nwClasses.Event(msgtext,myfunc,False,True)
                 delete_ssh_keys()
             elif sleepandtryagain:
-                msgtext = ("NE not ready. Sleeping " + str(nwConfig.expectSleep) +
-                    " seconds.")    
+                delay = ne.grabbudget.delay()
+                msgtext = ("NE not ready. Retrying NE ID: " + str(ne.id) + " in " +
+                    str(int(delay)) + " seconds.")    
                 dingding = nwClasses.Event(msgtext,myfunc,False,True)
-                sleeper()
-            elif len(ne.type.nox_discoveryoutput) < schemaModule.minimum_discoveryoutputlength:
+                return delay
+            elif outputlength < schemaModule.minimumOutputLength(ne):
+                delay = ne.grabbudget.delay()
                 logging.debug(myfunc + '\t' +
-                    "Length of nox_discoveryoutput: '" + str(len(ne.type.nox_discoveryoutput)) + 
-                    "' which is less than 'schemaMoodule.minimum_discoveryoutputlength' of '" + 
-                    str(schemaModule.minimum_discoveryoutputlength) + "'. Sleeping and trying again.")
-                sleeper()
+                    "Length of nox_discoveryoutput: '" + str(outputlength) + 
+                    "' which is less than the discovery profile minimum of '" + 
+                    str(schemaModule.minimumOutputLength(ne)) + "'. Trying again in " +
+                    str(int(delay)) + " seconds.")
+                return delay
             else:
-                finished = True
-        return(ne)
+                return None
+        logging.debug("dataGrabber(): Maxattempts of "+str(ne.grabbudget.budget)+" reached")
+        return None
     # take the base NE and based on type, append
     #  the specific type object from the schemaModule
-    basic_ne = schemaModule.appendTypeToNE(basic_ne)
+    if basic_ne.pullbudget.attempts == 0:
+        basic_ne = schemaModule.appendTypeToNE(basic_ne)
     if basic_ne.type != None:
-        counter = 0
-        counter_maxattempts = nwConfig.maxpullattempts
         finished = False
         while not finished:
-            logging.debug(myfunc + '\t' +
-                "At end of while loop, basic_ne.badpull = " + str(basic_ne.badpull))
-            counter += 1
-            # first thing we want to do is build the expect script to do discovery
-            bool_useprimer = False
-            logging.debug(myfunc + '\t' + "attempting to build temp_ne discovery expect script from body...")
-            basic_ne.type.nox_discoveryexpectscript = buildExpectScript(basic_ne)
-            logging.debug(myfunc + '\t' + "attempting to build temp_ne discovery expect command from NE info...")
-            basic_ne.type.nox_discoveryexpectcommand = buildExpectCommand(basic_ne.sourceEntryObj,bool_useprimer,basic_ne)
+            # a fresh grabbudget means this is the start of a new pull
+            if basic_ne.grabbudget.attempts == 0:
+                basic_ne.pullbudget.attempt()
             # now we want to run the discovery and append results to object
-            basic_ne = dataGrabber(basic_ne)
+            delay = dataGrabber(basic_ne)
+            if delay != None:
+                return nwClasses.Retry(delay)
 
             logging.debug(myfunc + '\t' + 
                 "now have 'basic_ne.type.nox_discoveryoutput' of len: " + str(len(basic_ne.type.nox_discoveryoutput)))
             # dump the output to file for testing purposes.
-            logging.debug(myfunc + '\t' + 
-                "Attempting to write 'basic_ne.type.nox_discoveryoutput' to file...")
-            basic_ne.type.dumpDiscoveryOutputToFile()
+            if basic_ne.type.nox_discoverystream == None:
+                logging.debug(myfunc + '\t' + 
+                    "Attempting to write 'basic_ne.type.nox_discoveryoutput' to file...")
+                basic_ne.type.dumpDiscoveryOutputToFile()
             # dump the Network Element object to pickle file for testing purposes.
             #logging.debug(myfunc + '\t' + "Attempting to write 'basic_ne' to pickle file...")
             #basic_ne.pickleMeElmo()
@@ -725,12 +1035,19 @@ def buildAdvancedNE(basic_ne):
                 if not basic_ne.badpull:
                     finished = True
                     break
-            if counter >= counter_maxattempts:
-                msg = "Tried " + str(counter) + " times and still couldn't "
+            failure = basic_ne.sourceEntryObj.failure
+            if failure != None and failure.fatal:
+                # dataGrabber already said why, no point pulling again
+                basic_ne.badpull = True
+                finished = True
+                break
+            if basic_ne.pullbudget.exhausted():
+                msg = "Tried " + str(basic_ne.pullbudget.attempts) + " times and still couldn't "
                 msg += "get a good data pull. Abandoning."
                 dingding = nwClasses.Event(msg,myfunc,False,True)
                 finished = True
                 break
+            basic_ne.grabbudget.reset()
             logging.debug(myfunc + '\t' +
                 "At end of while loop, basic_ne.badpull = " + str(basic_ne.badpull))
     else:
@@ -742,8 +1059,16 @@ def inititialzeNetworkElements(target,currentCrawl):
     ''' Takes a target and loops through the valid 
     entrypoints and builds the network element objects
     based on class. 
+
+    The base NE's are created one at a time so NE id numbers 
+    stay in entrypoint order. The discovery pulls are then 
+    run by a WorkerPool of up to nwConfig.discoveryWorkers 
+    threads (which also parks the NE's that have to wait) and
+    the finished NE's are appended to currentCrawl.loo_ne
+    in entrypoint order no matter which pull finishes first.
     '''
     myfunc = str(giveupthefunc())
+    loo_base_ne = []
     for idx,entry in enumerate(target.entrypointlist):
         if entry.primersuccess:
             logging.debug(myfunc + '\t' +
@@ -751,18 +1076,32 @@ def inititialzeNetworkElements(target,currentCrawl):
                 ", with IP of " + entry.ip)
             # create the base NE from primeroutput data
             temp_ne = createBaseNE(target,entry)
-            # now that we have the base we can run another pull for more specific data
-            logging.debug(myfunc + '\t' +
-                "\t\t\t\t\t\t-=-=-=-==-=-=-=-=-=-=-=-=-=-=-  INITNTWELEMENTS WORKING ON ENTRYPOINT " + 
-                str(idx+1) + " of " + str(len(target.entrypointlist)) + 
-                "   -=-=-=-==-=-=-=-=-=-=-=-=-=-=-")
-            temp_ne = buildAdvancedNE(temp_ne)
-            # append it to current crawl results list of objects network elements
-            currentCrawl.loo_ne.append(temp_ne)
-            msgtext = ("Crawled NE object:::" + temp_ne.dump_basic_singleline())
-            dingding = nwClasses.Event(msgtext,myfunc,False,True)
-            logging.debug(myfunc + '\t' + 
-                "AFTER COMPLETING CRAWL: \n\r" + temp_ne.dump_basic_multiline())
+            loo_base_ne.append((idx,temp_ne))
+    def discoverNE(idx,temp_ne):
+        # now that we have the base we can run another pull for more specific data
+        logging.debug(myfunc + '\t' +
+            "\t\t\t\t\t\t-=-=-=-==-=-=-=-=-=-=-=-=-=-=-  INITNTWELEMENTS WORKING ON ENTRYPOINT " + 
+            str(idx+1) + " of " + str(len(target.entrypointlist)) + 
+            "   -=-=-=-==-=-=-=-=-=-=-=-=-=-=-")
+        return buildAdvancedNE(temp_ne)
+    numworkers = max(1,min(nwConfig.discoveryWorkers,len(loo_base_ne)))
+    logging.debug(myfunc + '\t' +
+        "Running discovery on " + str(len(loo_base_ne)) + 
+        " NE's with " + str(numworkers) + " workers...")
+    pool = nwClasses.WorkerPool(numworkers,'inititialzeNetworkElements')
+    for idx,temp_ne in loo_base_ne:
+        pool.submit(discoverNE,idx,temp_ne)
+    loo_crawled = pool.join()
+    for i,temp_ne in enumerate(loo_crawled):
+        if temp_ne is None:
+            # the worker hit an exception, keep the base NE 
+            temp_ne = loo_base_ne[i][1]
+        # append it to current crawl results list of objects network elements
+        currentCrawl.loo_ne.append(temp_ne)
+        msgtext = ("Crawled NE object:::" + temp_ne.dump_basic_singleline())
+        dingding = nwClasses.Event(msgtext,myfunc,False,True)
+        logging.debug(myfunc + '\t' + 
+            "AFTER COMPLETING CRAWL: \n\r" + temp_ne.dump_basic_multiline())
 
 def find_more_targets(target,currentCrawl):
     ''' takes the currentCrawl and analyzes the NE's to discover 
@@ -779,8 +1118,11 @@ def find_more_targets(target,currentCrawl):
     # do we need to do anything else before returning to burrow?
 
 def lookup_ne_by_id(i,loo_ne):
-    ''' Returns the NE object with id == i
+    ''' Returns the NE object with id == i. A crawl's
+    loo_ne is an NEList so this goes through its id index.
     '''
+    if isinstance(loo_ne,nwClasses.NEList):
+        return loo_ne.by_id(i)
     for ne in loo_ne:
         if ne.id == i:
             return ne
@@ -888,8 +1230,10 @@ def stats_view(crawl):
         logging.debug(myfunc + '\t' + "\t\t_____________________________________________________")
         logging.debug(myfunc + '\t' + "\t\tPARENTS OF " + ne.hostname.value)
         logging.debug(myfunc + '\t' + "\t\t" + nwConfig.ne_fmt.format(*nwConfig.ne_hdr))
-        for parent in filter((lambda x: x.id in map((lambda y: y.id),ne.parents.parentlist)),crawl.loo_ne):
-            logging.debug(myfunc + '\t' + "\t\t" + parent.dump_rowformat())
+        for parent in ne.parents.parentlist:
+            parentneobj = lookup_ne_by_id(parent.id,crawl.loo_ne)
+            if parentneobj is not None:
+                logging.debug(myfunc + '\t' + "\t\t" + parentneobj.dump_rowformat())
         logging.debug(myfunc + '\t' + "\t\t_____________________________________________________")
         logging.debug(myfunc + '\t' + "")
         logging.debug(myfunc + '\t' + "")
@@ -900,23 +1244,30 @@ def oui_converter(currentCrawl):
     of the hostname using the nwOUIExplorer classes.
     '''
     myfunc = str(giveupthefunc())
-    import nwOUIexplorer
-    for ne in currentCrawl.loo_ne:
-        if ":" in ne.hostname.value: # quick and dirty mac detection
-            try:
-                ouifinder = nwOUIexplorer.Oui_Locator(ne.hostname.value)
-                ne.hostname.value = ouifinder.return_combo()
-                try:
-                    for macstring in ne.macs.macslist:
-                        tmac = nwOUIexplorer.Oui_Locator(macstring.value)
-                        macstring.value = tmac.return_combo()
-                except Exception as ex_maclist:
-                    logging.debug(myfunc + '\t' +
-                        "Exception converting ne.macs.macslist values to oui combo: " + 
-                        str(ex_maclist))
-            except Exception as ex_ouilookup:
-                logging.debug(myfunc + '\t' + 
-                    "Exception doing OUI lookup from NE hostname mac: " + str(ex_ouilookup))
+    # look up every mac involved with one batch call
+    loo_macne = [ne for ne in currentCrawl.loo_ne if ":" in ne.hostname.value] # quick and dirty mac detection
+    macstrings = []
+    for ne in loo_macne:
+        macstrings.append(ne.hostname.value)
+        macstrings.extend([macstring.value for macstring in ne.macs.macslist])
+    try:
+        combos = nwOUIexplorer.resolve_macs(macstrings)
+    except Exception as ex_ouilookup:
+        logging.debug(myfunc + '\t' + 
+            "Exception doing OUI lookup for NE macs: " + str(ex_ouilookup))
+        return
+    for ne in loo_macne:
+        if ne.hostname.value not in combos:
+            logging.debug(myfunc + '\t' + 
+                "No OUI lookup for NE hostname mac: " + ne.hostname.value)
+            continue
+        ne.hostname.value = combos[ne.hostname.value]
+        for macstring in ne.macs.macslist:
+            if macstring.value in combos:
+                macstring.value = combos[macstring.value]
+            else:
+                logging.debug(myfunc + '\t' +
+                    "No OUI lookup for ne.macs.macslist value: " + macstring.value)
 
 def clean_dupes(currentCrawl):
     ''' Clean up some of the duplicate NE's that show up when there are a lot of
@@ -980,7 +1331,10 @@ def ne_audit(currentCrawl):
     logging.debug(myfunc + '\t' +
         "After removing duplicates from loo_ne: " + str(len(currentCrawl.loo_ne)))
 
-    stripped = [item for item in currentCrawl.loo_scratchpad if item not in currentCrawl.loo_ne]
+    # NE's compare equal on their chassis MAC so check the MAC index
+    #  instead of 'item not in currentCrawl.loo_ne'
+    stripped = [item for item in currentCrawl.loo_scratchpad 
+                if not currentCrawl.loo_ne.by_mac(item.macs.macslist[0].value)]
     '''
     stripped = set(currentCrawl.loo_ne)
     for ne in currentCrawl.loo_ne:
@@ -998,21 +1352,20 @@ def ne_audit(currentCrawl):
     logging.debug(myfunc + '\t' +
         "After removing duplicates from loo_scratchpad(stripped): " + str(len(stripped)))
     # now we need to figure out how to get rid of these NE's that are actually port macs of other NEs
-    portmacs = []
+    portmacs = set()
     for ne in currentCrawl.loo_ne:
         try:
             for port in ne.type.ports.portlist:
-                portmacs.append(port.mac.value)
+                portmacs.add(nwClasses.mac_key(port.mac.value))
         except:
             pass
     # now go through and flag NEs that are really just port macs
     for ne in stripped:
-        for portmac in portmacs:
-            try:
-                if ne.macs.macslist[0].value == portmac:
-                    ne.removalflag = True
-            except:
-                pass
+        try:
+            if ne.macs.macslist[0].key in portmacs:
+                ne.removalflag = True
+        except:
+            pass
     unidentified = [x for x in stripped if not x.removalflag]
     logging.debug(myfunc + '\t' +
         "After removing known portmacs from stripped, unidentified): " + str(len(unidentified)))
@@ -1062,6 +1415,107 @@ def peckingOrder(currentCrawl):
 
 
 
+class CrawlPipeline(object):
+    ''' Work queue version of the burrow loop. Every entrypoint
+    is a job that runs prime -> base NE -> discovery/parse -> AMAP
+    expansion on its own WorkerPool thread and any new entrypoints 
+    it finds are queued right away instead of waiting for the whole
+    hop depth to finish. 
+
+    Each job carries a sequence key (its parent's key plus its own
+    position) so the NE's can be put back in a stable order once
+    the queue drains.
+    '''
+    def __init__(self,target,currentCrawl):
+        self.target = target
+        self.crawl = currentCrawl
+        self.lock = threading.Lock()
+        # remote macs and IPs that are already crawled or queued
+        self.claimedmacs = set()
+        self.claimedips = set()
+        self.results = []
+        self.pool = nwClasses.WorkerPool(nwConfig.pipelineWorkers,'CrawlPipeline')
+    def claim(self,rhost):
+        ''' Returns True if the remotehost has not been seen yet 
+        and marks its mac and IPs as taken. 
+        '''
+        mac = nwClasses.mac_key(rhost.remotemac.value)
+        ips = [rip.value for rip in rhost.remoteips.riplist]
+        with self.lock:
+            if mac in self.claimedmacs:
+                return False
+            if len(ips) > 0 and set(ips).issubset(self.claimedips):
+                return False
+            self.claimedmacs.add(mac)
+            self.claimedips.update(ips)
+        return True
+    def submit(self,entry,depth,seq):
+        self.pool.submit(self.crawlEntry,entry,depth,seq)
+    def crawlEntry(self,entry,depth,seq):
+        myfunc = str(giveupthefunc())
+        result = primeEntry(self.target,entry,seq[-1])
+        if isinstance(result,nwClasses.Retry):
+            return result
+        if not entry.primersuccess:
+            return
+        with self.lock:
+            # keeps NE id numbers from interleaving with other jobs
+            temp_ne = createBaseNE(self.target,entry)
+        return self.expandNE(temp_ne,depth,seq)
+    def expandNE(self,temp_ne,depth,seq):
+        ''' Runs the discovery pull on a base NE and queues up
+        the new entrypoints found in its AMAP table. 
+        '''
+        myfunc = str(giveupthefunc())
+        result = buildAdvancedNE(temp_ne)
+        if isinstance(result,nwClasses.Retry):
+            # come back to the pull, not the primer
+            return nwClasses.Retry(result.delay,self.expandNE,(temp_ne,depth,seq))
+        temp_ne = result
+        msgtext = ("Crawled NE object:::" + temp_ne.dump_basic_singleline())
+        dingding = nwClasses.Event(msgtext,myfunc,False,True)
+        with self.lock:
+            self.results.append((seq,temp_ne))
+            try:
+                self.claimedmacs.add(temp_ne.macs.macslist[0].key)
+            except Exception as ex_claim:
+                logging.debug(myfunc + '\t' +
+                    "No chassis mac to claim for NE: " + temp_ne.id)
+        if depth >= nwConfig.maxcrawldepth:
+            logging.debug(myfunc + '\t' +
+                "Max crawl depth " + str(nwConfig.maxcrawldepth) + 
+                " reached. Not expanding NE ID: " + temp_ne.id)
+            return
+        newrhosts = []
+        for rhost in schemaModule.gather_remotehosts(temp_ne):
+            if self.claim(rhost):
+                newrhosts.append(rhost)
+        loo_entrypoints = schemaModule.convert_loo_remotehosts_to_loo_entrypoints(newrhosts)
+        msgtext = ("Expanded NE ID: " + temp_ne.id + " at hopdepth " + str(depth) +
+            ". Number of new Entrypoints = " + str(len(loo_entrypoints)))
+        dingding = nwClasses.Event(msgtext,myfunc,False,True)
+        if nwConfig.reachabilitySweep:
+            reachabilitySweep(loo_entrypoints)
+        for k,ep in enumerate(loo_entrypoints):
+            self.submit(ep,depth + 1,seq + (k,))
+    def run(self):
+        ''' Queues the target's entrypoints, waits for the queue
+        to drain and appends the NE's to the crawl in sequence order.
+        '''
+        for entry in self.target.entrypointlist:
+            self.claimedips.add(entry.ip)
+        if nwConfig.reachabilitySweep:
+            reachabilitySweep(self.target.entrypointlist)
+        for idx,entry in enumerate(self.target.entrypointlist):
+            self.submit(entry,self.target.hopdepth,(idx,))
+        self.pool.join()
+        self.results.sort(key=operator.itemgetter(0))
+        for seq,ne in self.results:
+            self.crawl.loo_ne.append(ne)
+        # fill in the remotehost to NE links that gen_next_target would have made
+        schemaModule.link_amaps_to_ne(self.crawl)
+        return self.crawl
+
 def burrow(target,currentCrawl=None):
     ''' This is the main runtime function of the crawler.
     This function should be initiated inside the main()
@@ -1072,14 +1526,23 @@ def burrow(target,currentCrawl=None):
     Returns the currentCrawl results as an object
     '''
     myfunc = str(giveupthefunc())
+    # tag the Events logged while crawling with the target
+    nwClasses.eventcontext.targetid = target.id
+    if nwConfig.pipelinedCrawl:
+        if currentCrawl == None:
+            currentCrawl = nwClasses.CrawlResults(target.id)
+        currentCrawl = CrawlPipeline(target,currentCrawl).run()
     # as long as we're under crawl depth
-    finished = False
+    finished = nwConfig.pipelinedCrawl
     count = 0
     while not finished:
         count += 1
         if count > 10:
             break
         elif target.hopdepth <= nwConfig.maxcrawldepth:
+            # skip the entrypoints that don't even answer on their port
+            if nwConfig.reachabilitySweep:
+                reachabilitySweep(target.entrypointlist)
             # first kick off the primerBrain to get things started
             primerBrain(target)
             ''' Now we know several things: 
@@ -6,19 +6,29 @@ Written by Russell Endicott (rendicott@gmail.com)
 '''
 
 import re
+import os
+import mmap
+import struct
+import threading
+
+from nwClasses import parse_mac, format_mac
 
 ''' Offline database sourced from IEEE: 
     http://standards-oui.ieee.org/oui.txt
 '''
 ouidatabasetextfile = 'oui-database.txt'
+''' Binary index compiled from the text file by build_index(),
+    it's rebuilt whenever the text file is newer.
+'''
+ouidatabaseindexfile = 'oui-database.idx'
+
+class Exception_Dataload_OUI_Database(Exception): pass
+class Exception_Constructor_Locator_MacString(Exception): pass
+class Exception_Constructor_Locator_MacString_Validation_Short(Exception): pass
 
-try:
-    with open(ouidatabasetextfile,'rb') as f:
-        ouidatabaselist = f.readlines()
-except Exception as ex_ouiload:
-    raise Exception_Dataload_OUI_Database(
-        "Exception reading ouidatabasetextfile: '" + 
-        ouidatabasetextfile + "' : " + str(ex_ouiload))
+''' Nothing is loaded until the first lookup, see get_ouidatabase() '''
+ouidatabase = None
+ouidatabaselock = threading.Lock()
 
 class Oui():
     ''' Holds properties and methods
@@ -27,9 +37,299 @@ class Oui():
     def __init__(self):
         pass
 
-class Exception_Dataload_OUI_Database(Exception): pass
-class Exception_Constructor_Locator_MacString(Exception): pass
-class Exception_Constructor_Locator_MacString_Validation_Short(Exception): pass
+re_hexline = re.compile(
+    r'^\s*([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})\s+\(hex\)\s*(.*)$')
+re_base16line = re.compile(
+    r'^\s*([0-9A-Fa-f]{6})(?:-([0-9A-Fa-f]{6}))?\s+\(base 16\)')
+
+class Oui_Database():
+    ''' The IEEE listing parsed into dictionaries keyed by the 
+    assignment's prefix as an integer: 24 bits for MA-L (OUI),
+    28 bits for MA-M and 36 bits for MA-S. The MA-M and MA-S 
+    entries are recognized by the range on their '(base 16)'
+    line (e.g., 000000-0FFFFF) if the listing has them. 
+
+    Nothing is parsed until the first lookup().
+    '''
+    def __init__(self,lines):
+        self.lines = lines
+        self.loaded = False
+        self.ma_l = {}
+        self.ma_m = {}
+        self.ma_s = {}
+    def load(self):
+        pending = None
+        for line in self.lines:
+            match_hex = re_hexline.search(line)
+            if match_hex:
+                if pending != None:
+                    self.ma_l.setdefault(*pending)
+                oui = int(''.join(match_hex.group(1,2,3)),16)
+                pending = (oui,match_hex.group(4).rstrip('\r\n '))
+                continue
+            match_base16 = re_base16line.search(line)
+            if match_base16 and pending != None:
+                oui,organization = pending
+                pending = None
+                if match_base16.group(2) == None:
+                    self.ma_l.setdefault(oui,organization)
+                    continue
+                start = int(match_base16.group(1),16)
+                size = int(match_base16.group(2),16) - start + 1
+                if size == 0x100000:
+                    self.ma_m.setdefault((oui << 4) | (start >> 20),organization)
+                elif size == 0x1000:
+                    self.ma_s.setdefault((oui << 12) | (start >> 12),organization)
+                else:
+                    self.ma_l.setdefault(oui,organization)
+        if pending != None:
+            self.ma_l.setdefault(*pending)
+        self.loaded = True
+    def lookup(self,hexstring):
+        ''' Takes the mac (or at least the first 6 digits of it) 
+        as a string of hex digits and returns the organization 
+        of the most specific assignment it falls in or ''.
+        '''
+        if not self.loaded:
+            self.load()
+        if len(hexstring) >= 9 and len(self.ma_s) > 0:
+            organization = self.ma_s.get(int(hexstring[0:9],16))
+            if organization != None:
+                return organization
+        if len(hexstring) >= 7 and len(self.ma_m) > 0:
+            organization = self.ma_m.get(int(hexstring[0:7],16))
+            if organization != None:
+                return organization
+        return self.ma_l.get(int(hexstring[0:6],16),'')
+
+class Oui_Index():
+    ''' Read only view of the binary index written by build_index().
+    The file is mmap'd and binary searched in place so opening it
+    costs next to nothing and parallel processes share the pages.
+    Has the same lookup() as Oui_Database.
+
+    Layout (little endian): a header of magic, the number of MA-S,
+    MA-M and MA-L records and the offset of the string table, then
+    each table's (prefix,string offset) records sorted by prefix,
+    then the NUL terminated organization strings.
+    '''
+    magic = 'NWOUI\x00\x01\x00'
+    headerfmt = '<8sIIII'
+    # table name, record format, number of hex digits in the prefix
+    tables = [('ma_s','<QI',9),('ma_m','<II',7),('ma_l','<II',6)]
+    def __init__(self,indexfile):
+        with open(indexfile,'rb') as f:
+            try:
+                self.mm = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+            except ValueError as ex_mmap:
+                # empty file
+                raise Exception_Dataload_OUI_Database(
+                    "Can't map OUI index '" + indexfile + "' : " + str(ex_mmap))
+        if len(self.mm) < struct.calcsize(self.headerfmt):
+            raise Exception_Dataload_OUI_Database(
+                "OUI index '" + indexfile + "' is truncated")
+        header = struct.unpack_from(self.headerfmt,self.mm,0)
+        if header[0] != self.magic:
+            raise Exception_Dataload_OUI_Database(
+                "OUI index '" + indexfile + "' has the wrong format")
+        self.stringsoffset = header[4]
+        self.layout = {}
+        offset = struct.calcsize(self.headerfmt)
+        for (name,fmt,digits),count in zip(self.tables,header[1:4]):
+            self.layout[name] = (offset,count,fmt,struct.calcsize(fmt))
+            offset += count * struct.calcsize(fmt)
+    def find(self,name,key):
+        ''' Binary searches table name for key and returns
+        the organization or None.
+        '''
+        base,count,fmt,size = self.layout[name]
+        lo = 0
+        hi = count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            midkey,stringoffset = struct.unpack_from(fmt,self.mm,base + mid * size)
+            if midkey < key:
+                lo = mid + 1
+            elif midkey > key:
+                hi = mid
+            else:
+                start = self.stringsoffset + stringoffset
+                return self.mm[start:self.mm.find('\x00',start)]
+        return None
+    def lookup(self,hexstring):
+        ''' Takes the mac (or at least the first 6 digits of it) 
+        as a string of hex digits and returns the organization 
+        of the most specific assignment it falls in or ''.
+        '''
+        for name,fmt,digits in self.tables:
+            if len(hexstring) >= digits:
+                organization = self.find(name,int(hexstring[0:digits],16))
+                if organization != None:
+                    return organization
+        return ''
+
+def read_textfile(textfile):
+    ''' Returns the lines of the IEEE listing in textfile
+    '''
+    try:
+        with open(textfile,'rb') as f:
+            return f.readlines()
+    except Exception as ex_ouiload:
+        raise Exception_Dataload_OUI_Database(
+            "Exception reading ouidatabasetextfile: '" + 
+            textfile + "' : " + str(ex_ouiload))
+
+def build_index(textfile,indexfile):
+    ''' Compiles the IEEE listing in textfile into the binary
+    index that Oui_Index reads. The index is written to a temp
+    file and renamed into place so readers never see half of it.
+    '''
+    database = Oui_Database(read_textfile(textfile))
+    database.load()
+    strings = []
+    stringoffsets = {}
+    stringslength = 0
+    tables = []
+    for name,fmt,digits in Oui_Index.tables:
+        records = []
+        for key,organization in sorted(getattr(database,name).items()):
+            if organization not in stringoffsets:
+                stringoffsets[organization] = stringslength
+                strings.append(organization + '\x00')
+                stringslength += len(organization) + 1
+            records.append(struct.pack(fmt,key,stringoffsets[organization]))
+        tables.append(records)
+    stringsoffset = struct.calcsize(Oui_Index.headerfmt)
+    for (name,fmt,digits),records in zip(Oui_Index.tables,tables):
+        stringsoffset += len(records) * struct.calcsize(fmt)
+    header = struct.pack(Oui_Index.headerfmt,Oui_Index.magic,
+                len(tables[0]),len(tables[1]),len(tables[2]),stringsoffset)
+    tempfile = indexfile + '.' + str(os.getpid())
+    with open(tempfile,'wb') as f:
+        f.write(header)
+        for records in tables:
+            f.write(''.join(records))
+        f.write(''.join(strings))
+    try:
+        os.rename(tempfile,indexfile)
+    except OSError:
+        # windows won't rename over an existing file
+        os.remove(indexfile)
+        os.rename(tempfile,indexfile)
+
+def open_database(textfile,indexfile):
+    ''' Returns an Oui_Index for textfile, building the index first
+    if it's missing, unreadable or older than textfile. If the index
+    can't be written the text is parsed into an Oui_Database instead.
+    '''
+    try:
+        if (not os.path.exists(indexfile) or (os.path.exists(textfile) and
+                os.path.getmtime(textfile) > os.path.getmtime(indexfile))):
+            build_index(textfile,indexfile)
+        try:
+            return Oui_Index(indexfile)
+        except Exception_Dataload_OUI_Database:
+            build_index(textfile,indexfile)
+            return Oui_Index(indexfile)
+    except (IOError,OSError,Exception_Dataload_OUI_Database):
+        return Oui_Database(read_textfile(textfile))
+
+def get_ouidatabase():
+    ''' Returns the OUI database, opening it on the first call.
+    Safe to call from any number of threads, only one of them
+    does the loading.
+    '''
+    global ouidatabase
+    if ouidatabase == None:
+        with ouidatabaselock:
+            if ouidatabase == None:
+                ouidatabase = open_database(ouidatabasetextfile,ouidatabaseindexfile)
+    return ouidatabase
+
+re_highletters = re.compile('([g-zG-Z])')
+
+def check_macstring(macstring):
+    ''' returns true if string looks like
+    it might be a mac address, raises
+    Exception_Constructor_Locator_MacString_Validation_Short
+    if it doesn't
+    '''
+    if len(macstring) <= 11:
+        raise Exception_Constructor_Locator_MacString_Validation_Short(
+                'Length of provided macstring is <= 11 characters. Must not be MAC.')
+    elif re.search(re_highletters,macstring):
+        raise Exception_Constructor_Locator_MacString_Validation_Short(
+                'Provided macstring has chars g-z. Must not be MAC.')
+    return True
+
+def split_macstring(macstring):
+    ''' takes the mac in whatever format
+    and converts to list of two char strings.
+    supports: 00-00-00-00-00-00
+    supports: 00:00:00:00:00:00
+    supports: 0000-0000-0000
+    supports: 000000000000
+    '''
+    macint = parse_mac(macstring)
+    if macint != None:
+        return format_mac(macint).split(':')
+    tempstring = macstring.replace('-','')
+    tempstring = tempstring.replace(':','')
+    tempstring = tempstring.replace('.','')
+    tempstring = tempstring.lower()
+    return [tempstring[i:i+2] for i in range(0,len(tempstring),2)]
+
+def lookup_manufacturer(maclist):
+    ''' Looks up the mac (list of two char strings) in the 
+    ouidatabase and returns the manufacturer cleaned up for
+    use in a hostname.
+    '''
+    manu = ''
+    try:
+        manu = get_ouidatabase().lookup(''.join(maclist))
+    except ValueError:
+        # not hex, nothing to find
+        pass
+    manu = manu.replace('&','')
+    manu = manu.replace(',','')
+    manu = manu.replace('.','')
+    manu = manu.replace('(','-')
+    manu = manu.replace(')','-')
+    manu = manu.replace(' ','_')
+    return(manu)
+
+def format_combo(maclist,manufacturer):
+    ''' Returns the mac with the manufacturer appended
+    in parenthesis.
+    '''
+    return ':'.join(maclist) + "(" + manufacturer[:14] + ")"
+
+def resolve_macs(macstrings):
+    ''' Batch version of Oui_Locator(macstring).return_combo() for
+    a whole crawl's worth of macs. Takes any iterable of mac strings
+    in the formats Oui_Locator supports and returns a dict of 
+    macstring -> combo. Strings that don't look like macs are left 
+    out. Each distinct mac is normalized once and each distinct 
+    prefix is looked up once.
+    '''
+    combos = {}
+    bynormalized = {}
+    manufacturers = {}
+    for macstring in set(macstrings):
+        try:
+            check_macstring(macstring)
+        except (Exception_Constructor_Locator_MacString_Validation_Short,TypeError):
+            continue
+        maclist = split_macstring(macstring)
+        normalized = ''.join(maclist)
+        if normalized not in bynormalized:
+            # the database never looks past the first 9 digits (MA-S)
+            prefix = normalized[0:9]
+            if prefix not in manufacturers:
+                manufacturers[prefix] = lookup_manufacturer(maclist)
+            bynormalized[normalized] = format_combo(maclist,manufacturers[prefix])
+        combos[macstring] = bynormalized[normalized]
+    return combos
 
 class Oui_Locator():
     ''' Locates a particular OUI based
@@ -37,7 +337,6 @@ class Oui_Locator():
     as an object so that properties and
     methods can be called.
     '''
-    ouidatabase = ouidatabaselist
     def __init__(self,macstring=None):
         self.maclist = []
         self.oui = '' # First 3 octets of mac sep by dash
@@ -56,35 +355,14 @@ class Oui_Locator():
     def normalize_macstring(self):
         ''' takes the mac in whatever format
         and converts to list of two char strings.
-        supports: 00-00-00-00-00-00
-        supports: 00:00:00:00:00:00
-        supports: 0000-0000-0000
-        supports: 000000000000
+        See split_macstring()
         '''
-        tempstring = self.macstring.replace('-','')
-        tempstring = tempstring.replace(':','')
-        tempstring = tempstring.replace('.','')
-        tempstring = tempstring.lower()
-        for i in range(0,len(tempstring),2):
-            self.maclist.append(tempstring[i:i+2])
+        self.maclist.extend(split_macstring(self.macstring))
     def valid_macstring(self):
         ''' returns true if string looks like
         it might be a mac address
         '''
-        valid = True
-        re_highletters = re.compile('([g-zG-Z])')
-        match_highletters = re.search(re_highletters,self.macstring)
-        if len(self.macstring) <= 11:
-            raise Exception_Constructor_Locator_MacString_Validation_Short(
-                    'Length of provided macstring is <= 11 characters. Must not be MAC.')
-            valid = False
-        elif match_highletters:
-            raise Exception_Constructor_Locator_MacString_Validation_Short(
-                    'Provided macstring has chars g-z. Must not be MAC.')
-            valid = False
-        else:
-            valid = True
-        return valid
+        return check_macstring(self.macstring)
     def make_oui(self):
         ''' Takes the maclist and turns into 
         OUI string which is first three octets
@@ -93,23 +371,11 @@ class Oui_Locator():
         tempstring = '-'.join(self.maclist)
         self.oui = tempstring[0:8]
     def oui_lookup(self):
-        ''' Searches through the ouidatabaselist for the given
-        mac address. Returns the full manufacturer string. 
+        ''' Looks up the given mac address in the ouidatabase.
+        Returns the full manufacturer string. 
         '''
-        manu = ''
-        searchstring = self.oui.upper()
-        for idx,line in enumerate(ouidatabaselist):
-            if searchstring in line:
-                manu = (line.split('\t'))[2].rstrip('\n ')
-                break
-        manu = manu.replace('&','')
-        manu = manu.replace(',','')
-        manu = manu.replace('.','')
-        manu = manu.replace('(','-')
-        manu = manu.replace(')','-')
-        manu = manu.replace(' ','_')
-        self.manufacturer = manu
-        return(manu)
+        self.manufacturer = lookup_manufacturer(self.maclist)
+        return(self.manufacturer)
     def return_combo(self):
         ''' Takes the manufacturer string and 
         appends it to end of mac address in 
@@ -117,9 +383,7 @@ class Oui_Locator():
         '''
         if self.manufacturer == None:
             self.oui_lookup()
-        manus = self.manufacturer[:14]
-        mactail = ':'.join(self.maclist)
-        self.combo = mactail + "("+manus+")"
+        self.combo = format_combo(self.maclist,self.manufacturer)
         return(self.combo)
         
     def __repr__(self):
@@ -139,6 +403,10 @@ sampleset = [   "FC-DC-4A-6C-71-6B",
                 "A0:5D:C1:1a:8c:2a",
             ]
 
+if __name__ == '__main__':
+    # build step, e.g., after dropping in a new oui.txt
+    build_index(ouidatabasetextfile,ouidatabaseindexfile)
+
 # section for testing generators
 '''
 macs = map(lambda x: Oui_Locator(x),sampleset)
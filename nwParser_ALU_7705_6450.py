@@ -20,13 +20,21 @@ import inspect
 import gc
 import getpass
 import copy
+import threading
+import multiprocessing
+import itertools
 
 import xml.etree.ElementTree as ET
 
 # internal imports
 from nwClasses import werd # super important that this is first
+from nwClasses import regexes
+from nwClasses import RegexSet
+from nwClasses import TrackedRegex
 import nwConfig
 import nwClasses
+from nwTransport import Choice, Step, Dialogue, Watch
+import nwOUIexplorer
 
 # import the basic NetworkElement class from the NetWalk mothership
 #baseNEclass = __import__('nwClasses.NetworkElement')
@@ -37,6 +45,9 @@ from nwClasses import NetworkElement as baseNEclass
 # Import the stuff we need from the Type module
 from nw_NE_Type_SCS_6450 import TypeContainer_ALU_SCS
 from nw_NE_Type_SCS_6450 import discoveryCommands
+from nw_NE_Type_SCS_6450 import discoveryProfiles
+from nw_NE_Type_SCS_6450 import RegexIdentifier_SingleLine
+from nw_NE_Type_SCS_6450 import ElementIdentifier
 from nw_NE_Type_SCS_6450 import CommandOutput
 # from the Type module we want all of our parser classes
 from nw_NE_Type_SCS_6450 import Parser_Port
@@ -163,6 +174,18 @@ primerExpectTimeout = '8'
 primerExpectTimeoutString = "Timed Out!"
 primerExpectWaitString = "Need to wait."
 primerExpectBadHostname = "ssh: Could not resolve hostname"
+primerExpectBadHostKeys = "DOING SOMETHING NASTY"
+
+# markers that mean a pull has already failed. The transport watches for 
+#  these as the output comes in and ends the session right away instead
+#  of waiting out the rest of the script's timeouts.
+transportFailureWatch = [
+    Watch('timeout',re.escape(primerExpectTimeoutString)),
+    Watch('wait',re.escape(primerExpectWaitString)),
+    Watch('badhost',primerExpectBadHostname,fatal=True),
+    Watch('hostkey',primerExpectBadHostKeys),
+    Watch('refused','Connection refused',marker=primerExpectTimeoutString,fatal=True),
+    ]
 
 # define the prefixes/trailers used for various levels of expect hops
 class ExpectWrapper():
@@ -383,6 +406,86 @@ loo_expectwrappers.append(ew)
 
 
 
+''' The same login/prompt dialogue as the expect templates above
+    but built from nwTransport Steps so it can be driven in-process
+    when nwConfig.transport = 'pty'. Legs are (ip,port,username,password)
+    tuples starting with the first hop.
+'''
+def genTransportLogin(legs,timeout):
+    ''' Returns a list with the login Steps for each leg. Run
+    in order they leave the session sitting at the last 
+    device's prompt.
+    '''
+    loginfailures = [
+        Choice('Connection closed by remote host',abort=primerExpectWaitString),
+        Choice('Packet corrupt',abort=primerExpectWaitString),
+        Choice('Connection refused',abort=primerExpectTimeoutString),
+        ]
+    legsteps = []
+    for i,(ipaddr,port,username,password) in enumerate(legs):
+        steps = []
+        if i > 0:
+            # hop over from the previous device's CLI
+            steps.append(Step([Choice('>',send='ssh ' + ipaddr + '\r')],
+                timeout,primerExpectTimeoutString))
+            steps.append(Step([Choice(':',send=username + '\r')],timeout))
+        steps.append(Step([
+            Choice('yes/no',send='yes\r',repeat=True),
+            Choice('.assword',send=password + '\r'),
+            ] + loginfailures,timeout,primerExpectTimeoutString))
+        legsteps.append(steps)
+    return legsteps
+
+def genTransportDialogue(legs,steps,timeout):
+    ''' Wraps the payload steps with the login for the legs and
+    the steps the session cache needs to reuse the session.
+    '''
+    (ipaddr,port,username,password) = legs[0]
+    argv = [nwConfig.sshPrefix, username + '@' + ipaddr]
+    unwind = [Step([
+        Choice('>',send='exit\r'),
+        Choice('#',send='logout\r'),
+        ],timeout,primerExpectTimeoutString)]
+    settle = [Step([Choice('[>#]')],timeout)]
+    return Dialogue(argv,steps,
+        legs=[(leg[0],leg[2]) for leg in legs],
+        legsteps=genTransportLogin(legs,timeout),
+        unwind=unwind,
+        settle=settle,
+        watch=transportFailureWatch)
+
+def genTransportDialogue_Primer(legs,timeout):
+    ''' Builds the transport version of the primer-*.exp scripts.
+    The session is left at the prompt (no exit) so it can be 
+    reused for the discovery pull.
+    '''
+    showsystem = [Step([Choice('>')],timeout)]
+    showsysteminfo = [
+        Step([Choice('\\)',send='g')],timeout),
+        Step([Choice('#')],timeout),
+        ]
+    steps = [Step([
+        Choice('>',send='show system\r',steps=showsystem),
+        Choice('#',send='show system information\r',steps=showsysteminfo),
+        ],timeout,primerExpectTimeoutString)]
+    return genTransportDialogue(legs,steps,timeout)
+
+def genTransportDialogue_Discovery(ne_with_type,legs,timeout):
+    ''' Builds the transport version of genExpect_Discovery(), 
+    running the type's nox_discoverycommandlist once logged in.
+    '''
+    if len(legs) == 1:
+        # expectPrefix_hop0 overrides the timeout
+        timeout = 15
+    steps = [Step([Choice('>',send='\r')],timeout,primerExpectTimeoutString)]
+    for command in ne_with_type.type.nox_discoverycommandlist:
+        steps.append(Step([Choice('>',send=command + '\r')],timeout))
+        # add an additional return char to stabilize scripts
+        steps.append(Step([Choice('>',send='\r')],timeout))
+    return genTransportDialogue(legs,steps,timeout)
+
+
+
 '''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
 '''               END EXPECT SCRIPT DEFINITIONS                        '''
 '''=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-'''
@@ -405,12 +508,12 @@ class Type_Identifier():
         self.variant = variant
         self.regex = self.genregex()
     def genregex(self):
-        return(re.compile(self.indicatorstring))
+        return(regexes.get(self.indicatorstring))
     def check_match(self,linestring):
         ''' Takes a line of data as input and returns
         true if a match was found.
         '''
-        match = re.search(self.regex,linestring)
+        match = self.regex.search(linestring)
         if match:
             return True
         else:
@@ -425,12 +528,12 @@ class Hostname_Identifier():
         self.indicatorstring = indicatorstring
         self.regex = self.genregex()
     def genregex(self):
-        return(re.compile(self.indicatorstring))
+        return(regexes.get(self.indicatorstring))
     def check_match(self,linestring):
         ''' Takes a line of data as input and returns
         true if a match was found.
         '''
-        match = re.search(self.regex,linestring)
+        match = self.regex.search(linestring)
         if match:
             return True
         else:
@@ -439,7 +542,7 @@ class Hostname_Identifier():
         ''' takes a line of data as input and returns
         the contents of the 'value' ?P group
         '''
-        match = re.search(self.regex,linestring)
+        match = self.regex.search(linestring)
         if match:
             value = match.group('value')
             # strip out unwanted chars
@@ -500,8 +603,15 @@ def appendTypeToNE(ne_without_type):
     in the type section. 
     '''
     myfunc = str(giveupthefunc())
+    profile = ne_without_type.discoveryprofile
+    if profile not in discoveryProfiles:
+        msgtext = ("Unknown discovery profile '" + str(profile) + "' for NE ID: " +
+            str(ne_without_type.id) + ". Falling back to 'full'.")
+        dingding = nwClasses.Event(msgtext,myfunc,False,True)
+        profile = 'full'
+        ne_without_type.discoveryprofile = profile
     if ne_without_type.typestring == 'scs':
-        ne_without_type.type = TypeContainer_ALU_SCS()
+        ne_without_type.type = TypeContainer_ALU_SCS(profile)
     elif ne_without_type.typestring == 'scr':
         logging.debug(myfunc + '\t' + 
             "Typestring detected as 'scr' but that Type() module has not been written yet.")
@@ -510,6 +620,15 @@ def appendTypeToNE(ne_without_type):
             "Typestring detected as '" + ne_without_type.typestring + "' but that Type() module has not been written yet.")
     return ne_without_type
 
+def minimumOutputLength(ne):
+    ''' Returns the fewest lines of discovery output that count
+    as a good pull for the NE's discovery profile.
+    '''
+    minimum = getattr(ne.type,'nox_minimumoutputlength',None)
+    if minimum == None:
+        minimum = minimum_discoveryoutputlength
+    return minimum
+
 def giveupthefunc():
     #This function grabs the name of the current function
     # this is used in most of the debugging/info/warning messages
@@ -584,6 +703,68 @@ def genUniqueTypes(loo_typeIdentifiers):
     return listoftypes
             
 
+class OutputInspector():
+    ''' Line by line version of outputInspector() so output can be
+    checked while it is still streaming in. Feed it every line
+    then call result() once the output is complete.
+    '''
+    # one search per line, checked in this order
+    re_inspect = RegexSet([primerExpectTimeoutString,
+                            primerExpectWaitString,
+                            primerExpectBadHostname,
+                            primerExpectBadHostKeys])
+    def __init__(self):
+        self.reachable = False
+        self.authsuccess = False
+        self.sleepandtryagain = False
+        self.deletesshkeys = False
+        self.linecount = 0
+        # a timeout line depends on the total number of lines so
+        #  it can only be applied once we've seen them all
+        self.timedout = False
+    def feed(self,line):
+        self.linecount += 1
+        (index,groups) = self.re_inspect.first_match(line)
+        re_timeout_match = (index == 0)
+        re_wait_match = (index == 1)
+        re_badhost_match = (index == 2)
+        re_badkeys_match = (index == 3)
+        # timeout match could mean bad IP or bad password
+        if re_timeout_match:
+            self.timedout = True
+            return
+        # every other branch sets both reachable and authsuccess
+        #  which wipes out any earlier timeout
+        self.timedout = False
+        if re_wait_match:
+            self.sleepandtryagain = True
+            self.authsuccess = True
+            self.reachable = True
+        elif re_badhost_match:
+            self.sleepandtryagain = False
+            self.authsuccess = False
+            self.reachable = False
+        elif re_badkeys_match:
+            self.sleepandtryagain = True
+            self.authsuccess = False
+            self.reachable = True
+            self.deletesshkeys = True
+        else:
+            self.reachable = True
+            self.authsuccess = True
+            self.sleepandtryagain = False
+    def result(self):
+        reachable = self.reachable
+        authsuccess = self.authsuccess
+        if self.timedout:
+            # less than a few lines means bad IP
+            if self.linecount < 4:
+                reachable = False
+            # more than a few lines means bad auth
+            elif self.linecount > 4:
+                authsuccess = False
+        return(reachable,authsuccess,self.sleepandtryagain,self.deletesshkeys)
+
 def outputInspector(textlist):
     ''' This function lives inside the custom schemaModule since output from
     various vendors will be somewhat customized.
@@ -594,54 +775,11 @@ def outputInspector(textlist):
     "sleepandtryagain". That will tell the generic crawler how to flag the attempt.
 
     '''
-    myfunc = str(giveupthefunc)
-    re_timeout_string = primerExpectTimeoutString
-    re_timeout_regex = re.compile(re_timeout_string)
-    
-    re_wait_string = primerExpectWaitString
-    re_wait_regex = re.compile(re_wait_string)
-
-    re_badhost_string = primerExpectBadHostname
-    re_badhost_regex = re.compile(re_badhost_string)
-
-    re_badkeys_regex = re.compile('DOING SOMETHING NASTY')
-
-    reachable = False
-    authsuccess = False
-    sleepandtryagain = False
-    deletesshkeys = False
+    inspector = OutputInspector()
     # loop through the lines in the primer output
     for line in textlist:
-        re_timeout_match = re.search(re_timeout_regex,line)
-        re_wait_match = re.search(re_wait_regex,line)
-        re_badhost_match = re.search(re_badhost_regex,line)
-        re_badkeys_match = re.search(re_badkeys_regex,line)
-        # timeout match could mean bad IP or bad password
-        if re_timeout_match:
-            # less than a few lines means bad IP
-            if len(textlist) < 4:
-                reachable = False
-            # more than a few lines means bad auth
-            elif len(textlist) > 4:
-                authsuccess = False
-        elif re_wait_match:
-            sleepandtryagain = True
-            authsuccess = True
-            reachable = True
-        elif re_badhost_match:
-            sleepandtryagain = False
-            authsuccess = False
-            reachable = False
-        elif re_badkeys_match:
-            sleepandtryagain = True
-            authsuccess = False
-            reachable = True
-            deletesshkeys = True
-        else:
-            reachable = True
-            authsuccess = True
-            sleepandtryagain = False
-    return(reachable,authsuccess,sleepandtryagain,deletesshkeys)
+        inspector.feed(line)
+    return inspector.result()
 
 
 def detectNEtype(entryPrimerOutput,entry):
@@ -796,32 +934,64 @@ def fetchBaseNEdata(entryPrimerOutput,entry):
     hname = detectNEhostname(entryPrimerOutput)
     return(typestring,hname)
 
+class SectionView(object):
+    ''' Read only window onto lines[start:stop] so a command's 
+    section can be handed to the parsers without copying it out
+    of the discovery output. Supports what the parsers do with
+    a section: len(), indexing and iterating.
+    '''
+    def __init__(self,lines,start,stop):
+        self.lines = lines
+        self.start = start
+        self.stop = max(start,stop)
+    def __len__(self):
+        return self.stop - self.start
+    def __getitem__(self,i):
+        if isinstance(i,slice):
+            return [self.lines[self.start + j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError("SectionView index out of range")
+        return self.lines[self.start + i]
+    def __iter__(self):
+        return itertools.islice(self.lines,self.start,self.stop)
+
+def genCommandMatcher(loo_commandlist):
+    ''' Returns one alternation of all the CommandOutput regexes 
+    (compiled once per command list by the registry). A line that
+    doesn't match it can't match any single command so only the 
+    handful of echo lines get checked one command at a time.
+    '''
+    return regexes.get('|'.join('(?:' + c.commandstring + ')' 
+        for c in loo_commandlist))
+
 def chunkdata_alldiscovery_SCS(ne):
     ''' Dig into the discoveryoutput and pull the sections of output that
     correspond to the various commands. Creates CommandOutput() objects 
-    that contain the relevant output data for that command
+    that contain the relevant output data for that command. The output
+    is scanned once and each sectionoutput is a SectionView of it.
     '''
     myfunc = str(giveupthefunc())
     logging.debug(myfunc + '\t' + 
         "Examining NE: " + ne.dump_basic_singleline())
-    # first build a list of commands from typeModule.discoveryCommands
-    commandlist = []
-    for chunk in discoveryCommands:
-        if chunk.get('type') == ne.typestring:
-            commandlist = chunk.get('commands')
+    # the commands the NE's discovery profile actually ran
+    commandlist = ne.type.nox_discoverycommandlist
     # now that that list of commands and build typeModule.CommandOutput() command objects
     loo_commandlist = []
     for c in commandlist:
         tc = CommandOutput(c)
         loo_commandlist.append(tc)
 
+    output = ne.type.nox_discoveryoutput
+    matcher = genCommandMatcher(loo_commandlist)
     matchcount = 0
-    for r,c in enumerate(loo_commandlist):
-        for i,line in enumerate(ne.type.nox_discoveryoutput):
-            if c.check_match(line):
-                matchcount += 1
-                linefound = i
-                c.linefound.append(linefound)
+    for i,line in enumerate(output):
+        if matcher.search(line):
+            for c in loo_commandlist:
+                if c.check_match(line):
+                    matchcount += 1
+                    c.linefound.append(i)
     # check to see if there are any multiline matches
     for c in loo_commandlist:
         if len(c.linefound) > 0:
@@ -842,9 +1012,10 @@ def chunkdata_alldiscovery_SCS(ne):
                 c.stopline = loo_commandlist[indexofnextcommandinlist].startline
                 # add some end of list protection
                 if r == len(loo_commandlist)-2 and c.stopline == None:
-                    c.stopline = len(ne.type.nox_discoveryoutput)
-                for linenumber in range(c.startline+1,c.stopline):
-                    c.sectionoutput.append(ne.type.nox_discoveryoutput[linenumber])
+                    c.stopline = len(output)
+                if c.stopline == None:
+                    raise ValueError("next command in list never showed up")
+                c.sectionoutput = SectionView(output,c.startline+1,c.stopline)
                 logging.debug(myfunc + '\t' + 
                     "For '" + c.commandstring + "'. Grabbed lines = " + str(len(c.sectionoutput)))
                 successcount += 1
@@ -862,93 +1033,408 @@ def chunkdata_alldiscovery_SCS(ne):
     # now we have a list of commands and their output sections
     return(loo_commandlist)
 
+class ParseStage():
+    ''' One parser/generator pair from parseData_SCS along with the
+    discovery commands the parser reads. The parser only needs the
+    CommandOutput sections so it can run as soon as those commands
+    are in. The generator builds the type objects on the NE (and
+    pulls UIDs) so generators always run in parseStages_SCS order.
+
+    fields are the parser properties the generator reads, that's 
+    all that comes back when the parser runs in the parse pool.
+    '''
+    def __init__(self,name,commands,parser,generator,fields):
+        self.name = name
+        self.commands = commands
+        self.parser = parser
+        self.generator = generator
+        self.fields = fields
+
+def generate_ports(ne,parsedports):
+    # within the parsedports object all of the data we want has been processed
+    # now take the parsed ports object and build a port generator
+    pg = PortGenerator_TypeContainer_ALU_SCS(parsedports)
+    # within the port generator it as real type ports for the SCS structured type
+    ne.type.ports.portlist = pg.portlist
+
+def generate_interfaces(ne,ints):
+    ig = InterfaceGenerator_TypeContainer_ALU_SCS(ints)
+    ne.type.interfaces.interfacelist = ig.intlist
+
+def generate_chassis(ne,pchas):
+    chas = ChassisGenerator_TypeContainer_ALU_SCS(pchas)
+    ne.type.chassis = chas.chassis
+
+def generate_modules(ne,mod):
+    mg = ModuleGenerator_TypeContainer_ALU_SCS(mod)
+    ne.type.modules.modulelist = mg.modulelist
+
+def generate_vlans(ne,v):
+    vg = VlanGenerator_TypeContainer_ALU_SCS(v)
+    ne.type.vlans.vlanlist = vg.vlanlist
+
+def generate_routes(ne,r):
+    rg = RouteGenerator_TypeContainer_ALU_SCS(r)
+    ne.type.routes.routelist = rg.routelist
+
+def generate_dhcp(ne,d):
+    dg = DhcpGenerator_TypeContainer_ALU_SCS(d)
+    ne.type.dhcp = dg.dhcpcontainer
+
+def generate_configuration(ne,c):
+    cg = ConfigurationGenerator_TypeContainer_ALU_SCS(c)
+    ne.type.configuration = cg.configurationcontainer
+
+def generate_arp(ne,a):
+    ag = ArpGenerator_TypeContainer_ALU_SCS(a)
+    ne.type.arptable.arplist = ag.arplist
+
+def generate_amap(ne,am):
+    #logging.debug(myfunc + '\t' + am.dump())
+    amg = AmapGenerator_TypeContainer_ALU_SCS(am)
+    ne.type.amap = amg.amap
+
+''' the parse stages in the order parseData_SCS has always run them.
+Most of the heavy lifting happens during the parser's initialization.
+'''
+parseStages_SCS = [
+    ParseStage('ports',Parser_Port.commandsinvolved,
+        Parser_Port,generate_ports,['portlist']),
+    ParseStage('interfaces',['show ip interface'],
+        TableParser_ShowIpInterface,generate_interfaces,['elementlist']),
+    ParseStage('chassis',['show chassis'],
+        SectionParser_ShowChassis,generate_chassis,['element']),
+    # the modules/gbics section
+    ParseStage('modules',Parser_Module.commandsinvolved,
+        Parser_Module,generate_modules,['modulelist']),
+    ParseStage('vlans',['show vlan'],
+        TableParser_ShowVlan,generate_vlans,['elementlist']),
+    ParseStage('routes',['show ip router database'],
+        TableParser_ShowIpRouterDatabase,generate_routes,['elementlist']),
+    ParseStage('dhcp',Parser_Dhcp.commandsinvolved,
+        Parser_Dhcp,generate_dhcp,['stats','leaselist']),
+    ParseStage('configuration',['show configuration snapshot'],
+        SectionParser_ShowConfigurationSnapshot,generate_configuration,['text']),
+    ParseStage('arp',['show arp'],
+        TableParser_ShowArp,generate_arp,['elementlist']),
+    ParseStage('amap',['show amap'],
+        SectionParser_ShowAmap_RemoteHosts,generate_amap,['operstatus','elementlist']),
+    ]
+
+class ParsedRecord(object):
+    ''' Plain property holder the parse pool sends back in place
+    of a parser object. The generators only read properties so
+    they can't tell the difference.
+    '''
+    def __init__(self,**props):
+        self.__dict__.update(props)
+
+# things left out of a ParsedRecord, the generators never read them
+compactSkipTypes = (CommandOutput,RegexIdentifier_SingleLine,
+    ElementIdentifier,TrackedRegex,type(re.compile('')))
+
+def compactRecord(obj):
+    ''' Turns a parsed object (and anything hanging off of it) into
+    ParsedRecords, lists, dicts and strings so it can be pickled 
+    back from the parse pool without the raw output it came from.
+    '''
+    if isinstance(obj,(list,tuple,SectionView)):
+        return [compactRecord(o) for o in obj]
+    elif isinstance(obj,dict):
+        return dict((k,compactRecord(v)) for k,v in obj.items())
+    elif hasattr(obj,'__dict__') and not callable(obj):
+        record = ParsedRecord()
+        for k,v in obj.__dict__.items():
+            if not isinstance(v,compactSkipTypes):
+                setattr(record,k,compactRecord(v))
+        return record
+    return obj
+
+parseStagesByName_SCS = dict((stage.name,stage) for stage in parseStages_SCS)
+
+''' process pool the parse stages run in so the regex work isn't 
+done on (and doesn't hold the GIL for) the crawl threads. Built the
+first time it's needed, call startParsePool() before the crawl 
+threads are going so the workers aren't forked out of a busy process.
+'''
+parsepool = None
+parsepoollock = threading.Lock()
+
+def startParsePool():
+    ''' Starts the parse pool if it's turned on and not running yet.
+    '''
+    global parsepool
+    myfunc = str(giveupthefunc())
+    with parsepoollock:
+        if parsepool == None and nwConfig.parseInProcesses:
+            parsepool = multiprocessing.Pool(nwConfig.parseProcesses)
+            logging.debug(myfunc + '\t' + "Started parse pool")
+    return parsepool
+
+def stopParsePool():
+    ''' Lets the parse pool finish what it has and shuts it down.
+    '''
+    global parsepool
+    with parsepoollock:
+        if parsepool != None:
+            parsepool.close()
+            parsepool.join()
+            parsepool = None
+
+def runParseStage_SCS(stagename,sections):
+    ''' Runs in the parse pool. Rebuilds the CommandOutput objects 
+    from the raw section text (a dictionary of command to lines),
+    runs the stage's parser and returns the stage fields as a 
+    ParsedRecord.
+    '''
+    stage = parseStagesByName_SCS[stagename]
+    loo_commandlist = []
+    for command in stage.commands:
+        c = CommandOutput(command)
+        c.sectionoutput = sections.get(command,[])
+        loo_commandlist.append(c)
+    parsed = stage.parser(loo_commandlist)
+    record = ParsedRecord()
+    for field in stage.fields:
+        setattr(record,field,compactRecord(getattr(parsed,field)))
+    return record
+
+class ParsedStage():
+    ''' Handle for a stage that was parsed on the calling thread,
+    get() matches the AsyncResult the parse pool hands back.
+    '''
+    def __init__(self,parsed):
+        self.parsed = parsed
+    def get(self):
+        return self.parsed
+
+def submitParseStage_SCS(stage,loo_commandlist):
+    ''' Sends the sections the stage reads to the parse pool and
+    returns a handle whose get() waits on the parsed result. Parses
+    right here if the pool is turned off.
+    '''
+    pool = startParsePool()
+    if pool == None:
+        return ParsedStage(stage.parser(loo_commandlist))
+    sections = {}
+    for c in loo_commandlist:
+        if c.command_human in stage.commands:
+            sections[c.command_human] = list(c.sectionoutput)
+    return pool.apply_async(runParseStage_SCS,(stage.name,sections))
+
+def collectParseStages_SCS(submitted):
+    ''' Takes a dictionary of stage name to submitParseStage_SCS 
+    handle and waits on each one, returning stage name to parsed.
+    '''
+    parsedstages = {}
+    for name,handle in submitted.items():
+        parsedstages[name] = handle.get()
+    return parsedstages
+
+def pulledStages_SCS(commandlist):
+    ''' Returns the parseStages_SCS whose commands were all in 
+    the pulled commandlist. The rest are skipped since their
+    output was never asked for.
+    '''
+    return [stage for stage in parseStages_SCS 
+        if set(stage.commands).issubset(commandlist)]
+
+def finalize_parse_SCS(ne,parsedstages):
+    ''' Runs the generators for the parsed stages (a dictionary
+    of stage name to parser object) in parseStages_SCS order
+    and flags the NE as type crawled. Stages the discovery 
+    profile didn't pull leave their containers empty.
+    '''
+    for stage in parseStages_SCS:
+        if stage.name in parsedstages:
+            stage.generator(ne,parsedstages[stage.name])
+    # now flag the NE that it's been type crawled so it doesn't happen twice
+    ne.typecrawled = True
+    # now append the type.chassis mac to the NE maclist
+    m = ne.macs.Mac()
+    m.value = ne.type.chassis.mac.value
+    if len(m.value) < 12:
+        m.value = 'NA'
+    ne.macs.macslist.append(m)
+    return(ne)
+
+class DiscoveryStream_SCS():
+    ''' On the fly version of chunkdata_alldiscovery_SCS plus the
+    parse stages. Lines are fed in as the transport hands them over
+    and written straight to the discovery output log. A command's
+    section is closed the moment the next command in the list shows
+    up and every parse stage whose commands are all closed is run
+    right away, after which the raw sections are dropped. So only
+    the sections still waiting on a stage are ever held in memory.
+    '''
+    def __init__(self,ne):
+        self.ne = ne
+        commandlist = ne.type.nox_discoverycommandlist
+        self.loo_commandlist = [CommandOutput(c) for c in commandlist]
+        self.inspector = OutputInspector()
+        self.linecount = 0
+        # index of commands whose section is still collecting lines
+        self.opensections = []
+        self.successcount = 0
+        self.badpull = False
+        self.parsedstages = {}
+        self.pendingstages = pulledStages_SCS(commandlist)
+        self.wantedcommands = set()
+        for stage in self.pendingstages:
+            self.wantedcommands.update(stage.commands)
+        self.closedcommands = set()
+        self.outputfile = open(ne.type.discoveryOutputFilename(),'wb')
+    def feed(self,line):
+        ''' Takes the next line of discovery output.
+        '''
+        self.outputfile.write(line)
+        self.inspector.feed(line)
+        linenumber = self.linecount
+        self.linecount += 1
+        started = []
+        for r,c in enumerate(self.loo_commandlist):
+            if c.check_match(line):
+                c.linefound.append(linenumber)
+                if c.startline == None:
+                    c.startline = linenumber
+                    started.append(r)
+        for r in list(self.opensections):
+            c = self.loo_commandlist[r]
+            # a section runs from its command to the next command in the list
+            nextc = None
+            if r+1 < len(self.loo_commandlist):
+                nextc = self.loo_commandlist[r+1]
+            if nextc != None and nextc.startline != None:
+                self.close_section(r)
+            elif r not in started:
+                c.sectionoutput.append(line)
+        for r in started:
+            nextc = None
+            if r+1 < len(self.loo_commandlist):
+                nextc = self.loo_commandlist[r+1]
+            if nextc != None and nextc.startline != None:
+                # next command was already seen, nothing between them
+                self.close_section(r)
+            else:
+                self.opensections.append(r)
+    def close_section(self,r):
+        c = self.loo_commandlist[r]
+        if r in self.opensections:
+            self.opensections.remove(r)
+        c.stopline = self.loo_commandlist[r+1].startline
+        self.successcount += 1
+        if c.command_human not in self.wantedcommands:
+            c.sectionoutput = []
+        self.closedcommands.add(c.command_human)
+        self.run_ready_stages()
+    def run_ready_stages(self,final=False):
+        for stage in list(self.pendingstages):
+            ready = final
+            if not ready:
+                ready = True
+                for command in stage.commands:
+                    if command not in self.closedcommands:
+                        ready = False
+            if ready:
+                self.parsedstages[stage.name] = submitParseStage_SCS(stage,self.loo_commandlist)
+                self.pendingstages.remove(stage)
+                self.release_sections()
+    def release_sections(self):
+        ''' Drops the raw text of closed sections no pending stage
+        still needs. The parser objects keep whatever they use.
+        '''
+        stillwanted = set()
+        for stage in self.pendingstages:
+            stillwanted.update(stage.commands)
+        for c in self.loo_commandlist:
+            if c.command_human in self.closedcommands and c.command_human not in stillwanted:
+                c.sectionoutput = []
+    def close(self):
+        ''' Called once the output is complete. Closes up the 
+        sections the same way chunkdata_alldiscovery_SCS does at 
+        the end of the output and works out badpull.
+        '''
+        myfunc = str(giveupthefunc())
+        self.outputfile.close()
+        for r in list(self.opensections):
+            # add some end of list protection
+            if r == len(self.loo_commandlist)-2:
+                self.opensections.remove(r)
+                self.successcount += 1
+                self.closedcommands.add(self.loo_commandlist[r].command_human)
+        logging.debug(myfunc + '\t' +
+            "At end of streaming successcount = " + str(self.successcount))
+        if self.successcount < len(self.loo_commandlist)-1:
+            self.badpull = True
+            logging.debug("Successcount is less than len(loo_commandlist) of " + str(len(self.loo_commandlist)) +
+                ". Setting badpull = True for resubmission")
+        elif len(self.pendingstages) > 0:
+            # stages left over are waiting on commands that never closed
+            self.run_ready_stages(True)
+        self.release_sections()
+    def inspect(self):
+        return self.inspector.result()
+
+def genDiscoveryStream(ne):
+    ''' Returns a DiscoveryStream for the NE's type or None if the
+    type can't be parsed on the fly.
+    '''
+    if ne.typestring == 'scs':
+        return DiscoveryStream_SCS(ne)
+    return None
+
 def parseData_SCS(ne):
     ''' orchestrates the parsing functions and classes
     '''
     myfunc = str(giveupthefunc())
     logging.debug(myfunc + '\t' + 
         "Length of generated list of typeIdentifiers: " + str(len(loo_typeIdentifiers)))
+    stream = ne.type.nox_discoverystream
+    if stream != None:
+        # the output was already split and parsed as it streamed in
+        ne.type.nox_discoverystream = None
+        ne.badpull = stream.badpull
+        if not ne.badpull:
+            ne = finalize_parse_SCS(ne,collectParseStages_SCS(stream.parsedstages))
+        return(ne)
     # break up the discovery output into chunks and the relevant sections to CommandOutput() objects
     loo_commandlist = chunkdata_alldiscovery_SCS(ne)
     '''Now do some data validation to make sure we didn't get a bad data pull'''
     logging.debug(myfunc + '\t' + 
         "Length of loo_commandlist: " + str(len(loo_commandlist)))
-    # find the command list for this type of ne
-    complist = []
-    try:
-        for typecommands in discoveryCommands:
-            if typecommands.get('type') == ne.typestring:
-                complist = typecommands.get('commands')
-    except:
-        pass
+    # the command list this ne's discovery profile ran
+    complist = ne.type.nox_discoverycommandlist
     logging.debug(myfunc + '\t' +
-        "Length of discoveryCommands.commands[]: " + str(len(complist)))
+        "Length of discovery profile '" + ne.type.nox_discoveryprofile + 
+        "' commands[]: " + str(len(complist)))
     if len(loo_commandlist)+2 < len(complist):
         ne.badpull = True
     if not ne.badpull:
-        '''-----------------------------------------------------'''
-        # initialize the Parser for Port info. Most of the heavy lifting happens during initialization.
-        parsedports = Parser_Port(loo_commandlist)
-        # within the parsedports object all of the data we want has been processed
-        # now take the parsed ports object and build a port generator
-        pg = PortGenerator_TypeContainer_ALU_SCS(parsedports)
-        # within the port generator it as real type ports for the SCS structured type
-        ne.type.ports.portlist = pg.portlist
-        '''-----------------------------------------------------'''
-        ints = TableParser_ShowIpInterface(loo_commandlist)
-        ig = InterfaceGenerator_TypeContainer_ALU_SCS(ints)
-        ne.type.interfaces.interfacelist = ig.intlist
-        '''-----------------------------------------------------'''
-        pchas = SectionParser_ShowChassis(loo_commandlist)
-        chas = ChassisGenerator_TypeContainer_ALU_SCS(pchas)
-        ne.type.chassis = chas.chassis
-        '''-----------------------------------------------------'''
-        '''Now the modules/gbics section'''
-        mod = Parser_Module(loo_commandlist)
-        mg = ModuleGenerator_TypeContainer_ALU_SCS(mod)
-        ne.type.modules.modulelist = mg.modulelist
-        '''-----------------------------------------------------'''
-        '''Now the Vlans'''
-        v = TableParser_ShowVlan(loo_commandlist)
-        vg = VlanGenerator_TypeContainer_ALU_SCS(v)
-        ne.type.vlans.vlanlist = vg.vlanlist
-        '''-----------------------------------------------------'''
-        ''' now the routes'''
-        r = TableParser_ShowIpRouterDatabase(loo_commandlist)
-        rg = RouteGenerator_TypeContainer_ALU_SCS(r)
-        ne.type.routes.routelist = rg.routelist
-        '''-----------------------------------------------------'''
-        ''' now the DHCP'''
-        d = Parser_Dhcp(loo_commandlist)
-        dg = DhcpGenerator_TypeContainer_ALU_SCS(d)
-        ne.type.dhcp = dg.dhcpcontainer
-        '''-----------------------------------------------------'''
-        ''' now the config '''
-        c = SectionParser_ShowConfigurationSnapshot(loo_commandlist)
-        cg = ConfigurationGenerator_TypeContainer_ALU_SCS(c)
-        ne.type.configuration = cg.configurationcontainer
-        '''-----------------------------------------------------'''
-        ''' now the arp '''
-        a = TableParser_ShowArp(loo_commandlist)
-        ag = ArpGenerator_TypeContainer_ALU_SCS(a)
-        ne.type.arptable.arplist = ag.arplist
-        '''-----------------------------------------------------'''
-        ''' now the amap '''
-        am = SectionParser_ShowAmap_RemoteHosts(loo_commandlist)
-        #logging.debug(myfunc + '\t' + am.dump())
-        amg = AmapGenerator_TypeContainer_ALU_SCS(am)
-        ne.type.amap = amg.amap
-
-        # now flag the NE that it's been type crawled so it doesn't happen twice
-        ne.typecrawled = True
-        # now append the type.chassis mac to the NE maclist
-        m = ne.macs.Mac()
-        m.value = ne.type.chassis.mac.value
-        if len(m.value) < 12:
-            m.value = 'NA'
-        ne.macs.macslist.append(m)
+        submitted = {}
+        for stage in pulledStages_SCS(complist):
+            submitted[stage.name] = submitParseStage_SCS(stage,loo_commandlist)
+        ne = finalize_parse_SCS(ne,collectParseStages_SCS(submitted))
     return(ne)
 
+def gather_remotehosts(ne):
+    ''' Returns the list of AMAP remotehosts for a single NE
+    with the learnedfrom properties pointed back at the NE so 
+    they can be converted to entrypoints.
+    '''
+    myfunc = str(giveupthefunc())
+    rhosts = []
+    try:
+        for rhost in ne.type.amap.amaplist:
+            rhost.nox_learnedfromNEid = ne.id
+            rhost.nox_learnedfromEntryid = ne.sourceEntryId.value
+            rhost.nox_learnedfromEntryObj = ne.sourceEntryObj
+            rhost.nox_learnedfromAuthObj = ne.authobj
+            rhosts.append(rhost)
+    except Exception as ex_rhostcrawl:
+        logging.debug(myfunc + '\t' +
+        "Exception looking for rhosts in ne.type.amap. May not be SCS")
+    return rhosts
+
 def link_amaps_to_ne(crawl):
     ''' Loops through the AMAPLists of all NE.type's and links 
     NE id to remotehost. Used to determine if a remotehost
@@ -957,28 +1443,33 @@ def link_amaps_to_ne(crawl):
     myfunc = str(giveupthefunc())
     rhosts = []
     for ne in crawl.loo_ne:
-        try:
-            for rhost in ne.type.amap.amaplist:
-                rhost.nox_learnedfromNEid = ne.id
-                rhost.nox_learnedfromEntryid = ne.sourceEntryId.value
-                rhost.nox_learnedfromEntryObj = ne.sourceEntryObj
-                rhost.nox_learnedfromAuthObj = ne.authobj
-                rhosts.append(rhost)
-        except Exception as ex_rhostcrawl:
-            logging.debug(myfunc + '\t' +
-            "Exception looking for rhosts in ne.type.amap. May not be SCS")
-            pass
+        rhosts += gather_remotehosts(ne)
+    # each remotehost is one lookup in crawl.loo_ne's normalized MAC index
+    linked = 0
+    unlinked = 0
+    ambiguous = 0
     for rh in rhosts:
-        for ne in crawl.loo_ne:
-            try:
-                mac = ne.macs.macslist[0].value
-                #logging.debug("Examining ne mac: '" + mac + "' with rh mac: '" + rh.remotemac.value + "'")
-                if rh.remotemac.value in mac:
-                    rh.nox_linkedNEid = ne.id
-            except Exception as ex_maccompare:
-                logging.debug(myfunc + '\t' + 
-                    "Exception comparing NE mac with RH mac. NE hostname is '" + 
-                    ne.hostname.value + "'..." + str(ex_maccompare))
+        if nwClasses.parse_mac(rh.remotemac.value) == None:
+            logging.debug(myfunc + '\t' +
+                "Can't link RH with bad remotemac '" + str(rh.remotemac.value) + "'")
+            unlinked += 1
+            continue
+        matches = crawl.loo_ne.by_mac(rh.remotemac.value)
+        if len(matches) == 0:
+            unlinked += 1
+            continue
+        if len(matches) > 1:
+            logging.debug(myfunc + '\t' +
+                "RH mac '" + rh.remotemac.value + "' matches " + str(len(matches)) + 
+                " NE's: " + str([ne.id for ne in matches]))
+            ambiguous += 1
+        # the last NE in the crawl with the mac wins
+        rh.nox_linkedNEid = matches[-1].id
+        linked += 1
+    msgtext = ("Linked " + str(linked) + " of " + str(len(rhosts)) + 
+        " AMAP remotehosts to " + str(len(crawl.loo_ne)) + " NE's. Unlinked: " + 
+        str(unlinked) + ", Ambiguous: " + str(ambiguous))
+    dingding = nwClasses.Event(msgtext,myfunc,False,True)
 
     logging.debug(myfunc + "\t" + nwConfig.remotehost_fmt.format(*nwConfig.remotehost_hdr))
     for rh in rhosts:
@@ -1067,6 +1558,8 @@ def gen_next_target(target,currentCrawl):
     ntarget = nwClasses.Target(tid,loo_entrypoints,target.authlist)
     # take the previous hopdepth and increment by 1
     ntarget.hopdepth = target.hopdepth + 1
+    # learned NE's get pulled with the same discovery profile
+    ntarget.profile = target.profile
     # dump the tgt object to debug
     bool_eprowformat = True
     msg = ntarget.dumpdata(bool_eprowformat)
@@ -1079,19 +1572,38 @@ def peanut_gallery(crawl):
     and create really basic NE's for the Macs detected on the 
     switch links.
     '''
-    import nwOUIexplorer
     def map_cid_to_ne(ne):
         ''' Search the member list for the mac addres of the 
         Unknown NE and return additional details
         '''
-        for member in werd.loo_members:
-            if member.mac.lower() == newne.macs.macslist[0].value.lower():
-                ne.hostname.value = member.hostname
-                ne.typestring = member.typestring
+        member = members.get(ne.macs.macslist[0].key)
+        if member is not None:
+            ne.hostname.value = member.hostname
+            ne.typestring = member.typestring
         return(ne)
 
     myfunc = 'peanut_gallery()'
+    # look up the vendors for every mac in the mac-address-tables in one go
+    macstrings = []
+    for ne in crawl.loo_ne:
+        try:
+            for port in ne.type.ports.portlist:
+                for mac in port.associatedmacs.maclist:
+                    macstrings.append(mac.mac.value)
+        except AttributeError:
+            pass
+    try:
+        vendors = nwOUIexplorer.resolve_macs(macstrings)
+    except Exception as ex_ouifinder:
+        logging.debug(myfunc + '\t' + 
+            "Exception doing ouilookup on macs: " + str(ex_ouifinder))
+        vendors = {}
+    # index the members by mac once, later members win like before
+    members = {}
+    for member in werd.loo_members:
+        members[nwClasses.mac_key(member.mac)] = member
     temp_loo_ne = []
+    sightings = []
     for ne in crawl.loo_ne:
         try:
             for port in ne.type.ports.portlist:
@@ -1126,14 +1638,10 @@ def peanut_gallery(crawl):
                     
 
                     newne.typestring = "UNKNOWN"
-                    try:
-                        newne.hostname.value = newne.macs.macslist[0].value
-                        ouifinder = nwOUIexplorer.Oui_Locator(newne.hostname.value)
-                        newne.hostname.value = ouifinder.return_combo()
-                    except Exception as ex_ouifinder:
+                    newne.hostname.value = vendors.get(newne.macs.macslist[0].value,'UNKNOWN')
+                    if newne.hostname.value == 'UNKNOWN':
                         logging.debug(myfunc + '\t' + 
-                            "Exception doing ouilookup on mac: " + str(ex_ouifinder))
-                        newne.hostname.value = 'UNKNOWN'
+                            "No ouilookup for mac: " + str(newne.macs.macslist[0].value))
                     # try and get more info about the NE
                     newne = map_cid_to_ne(newne)
 
@@ -1148,14 +1656,8 @@ def peanut_gallery(crawl):
                     # only add to currentcrawl.loo_ne if this is not an rhost port (i.e., nox_macattack)
                     if port.operstatus.value == 'up' and not port.nox_macattack:
                         temp_loo_ne.append(newne)
-
-                        # create the child ANE and append to parent's children list
-                        anep = nwClasses.Assoc_NE(newne.id)
-                        anep.typestring = newne.typestring
-                        anep.hostname = newne.hostname.value
-                        anep.port.portid = port.id
-                        anep.port.slotport = port.slotport.value
-                        ne.children.childrenlist.append(anep)
+                        # remember where it was seen so it can be linked into the topology
+                        sightings.append((ne,port,newne))
 
                         # flag that we've crawled mac-address-table
                         ne.macattack = True
@@ -1175,8 +1677,18 @@ def peanut_gallery(crawl):
     logging.debug(myfunc + '\t' + 
         "After removing duplicates we have " + str(len(temp_loo_ne_unique)) + " new NEs.")
 
+    # the same mac can show up on more than one port, every sighting 
+    #  gets linked to the copy that made it through the dedupe
+    survivors = {}
+    for ne in temp_loo_ne_unique:
+        survivors[ne] = ne
     for ne in temp_loo_ne_unique:
         crawl.loo_ne.append(ne)
+        crawl.topology.add_node(ne)
+    for ne,port,newne in sightings:
+        survivor = survivors[newne]
+        crawl.topology.add_link(ne.id,survivor.id,'mac',port.slotport.value)
+        crawl.topology.add_parent(survivor.id,ne.id)
 
     counter_nomacattacks = 0
     for ne in crawl.loo_ne:
@@ -1186,8 +1698,11 @@ def peanut_gallery(crawl):
         "macattack performed on " + str(counter_nomacattacks) + " of " + str(len(crawl.loo_ne)) + " network elements.") 
 
 def lookup_ne_by_id(i,loo_ne):
-    ''' Returns the NE object with id == i
+    ''' Returns the NE object with id == i. A crawl's
+    loo_ne is an NEList so this goes through its id index.
     '''
+    if isinstance(loo_ne,nwClasses.NEList):
+        return loo_ne.by_id(i)
     for ne in loo_ne:
         if ne.id == i:
             return ne
@@ -1202,7 +1717,10 @@ def lookup_portobj_by_slotport(s,ne):
 
 def family_matters(crawl):
     ''' Establishes the parent/child relationships between
-    network elements. 
+    network elements. Builds crawl.topology out of the AMAP
+    and default route data, identifies the roots and then 
+    orients the AMAP links away from the roots. peanut_gallery()
+    adds the mac-address-table NE's and roto_rooter() finishes up.
     '''
     myfunc = str(giveupthefunc())
     '''
@@ -1217,7 +1735,19 @@ def family_matters(crawl):
         logging.debug(myfunc + '\t' +
             "Exception attempting to remove duplicates from crawl.loo_ne with set(): " + str(ex_dupremove))
     '''
-   
+    graph = nwClasses.TopologyGraph()
+    crawl.topology = graph
+    for ne in crawl.loo_ne:
+        graph.add_node(ne)
+    # link up the NE's that see each other in AMAP (nox_linkedNEid is from link_amaps_to_ne)
+    for ne in crawl.loo_ne:
+        try:
+            for rhost in ne.type.amap.amaplist:
+                if rhost.nox_linkedNEid in graph.nodes and rhost.nox_linkedNEid != ne.id:
+                    graph.add_link(ne.id,rhost.nox_linkedNEid,'amap',rhost.localslotport.value)
+        except Exception as ex_amaplink:
+            logging.debug(myfunc + '\t' +
+                "Exception linking AMAP remotehosts, may not be SCS: " + str(ex_amaplink))
 
     # now identify roots, this breaks if multiple sites in one crawl
     rootmac = ''
@@ -1232,10 +1762,11 @@ def family_matters(crawl):
                 "Exception attempting to pull default route: " + str(ex_drt))
         int_ip_found_in_crawl = False
         try:
-            for ne_ in crawl.loo_ne:
-                for interface in ne_.type.interfaces.interfacelist:
-                    if interface.address.value == ne.defaultrouteip:
-                        int_ip_found_in_crawl = True
+            # is the default gateway an interface of an NE in this crawl?
+            for gateway_ne in crawl.loo_ne.by_ip(ne.defaultrouteip):
+                int_ip_found_in_crawl = True
+                if gateway_ne is not ne:
+                    graph.add_link(ne.id,gateway_ne.id,'route')
             # have to make sure typecrawled is true otherwise it tries to make
             #  NE's with failed pulls into roots.
             ''' 20150604_russ-Also hit a bug where the absence of a default route would flag a
@@ -1260,13 +1791,27 @@ def family_matters(crawl):
                 "Exception identifying roots: " + str(ex_idroot))
             ne.isroot = False
 
+    # orient the AMAP links with a breadth first search away from the roots
+    reached = graph.orient([ne.id for ne in crawl.loo_ne if ne.isroot],'amap')
+    logging.debug(myfunc + '\t' +
+        "Reached " + str(len(reached)) + " of " + str(len(crawl.loo_ne)) + 
+        " NE's from the roots over AMAP")
 
-    '''Now we can identify the upstream port on each NE
-    The upstream port on each NE will always have the root NE's MAC
-    address listed in it's mac-address-table'''
+    '''Now we can identify the upstream port on each NE. It's the port
+    the search reached the NE on. If the search didn't reach it the 
+    upstream port will always have the root NE's MAC address listed 
+    in it's mac-address-table'''
     for ne in crawl.loo_ne:
         try:
             ne.rootNEmac = rootmac
+            parentids = graph.parents_of(ne.id)
+            if len(parentids) > 0 and graph.port(ne.id,parentids[0]) != '':
+                ne.upstreamSlotport = graph.port(ne.id,parentids[0])
+                ne.upstreamPort = lookup_portobj_by_slotport(ne.upstreamSlotport,ne)
+                logging.debug(myfunc + '\t' +
+                    "For '" + ne.hostname.value +
+                    "' found upstreamSlotport of '" + ne.upstreamSlotport + "' from AMAP")
+                continue
             for port in ne.type.ports.portlist:
                 for mac in port.associatedmacs.maclist:
                     if ne.rootNEmac in mac.mac.value:
@@ -1321,7 +1866,8 @@ def family_matters(crawl):
             ne.isaparent = False
             ne.islowestchild = False
 
-    # now find direct children
+    # the search only covers NE's with a root, for the rest any AMAP 
+    #  neighbour that isn't on the upstream port is assumed to be a child
     for ne in crawl.loo_ne:
         try:
             logging.debug(myfunc + '\t' +
@@ -1329,52 +1875,45 @@ def family_matters(crawl):
         except:
             logging.debug(myfunc + '\t' +
                 "Exception processing NE: " + str(ne.id))
-        if ne.isaparent:
-            try:
-                for rhost in ne.type.amap.amaplist:
-                    try:
-                        rhost_ne = lookup_ne_by_id(rhost.nox_linkedNEid,crawl.loo_ne)
-                        # as long as the rhost_ne isn't the root and isn't on the upstream port
-                        # if not rhost_ne.isroot and rhost.localslotport.value != ne.upstreamPort.slotport.value:
-                        dbg_msg = [str(rhost_ne.isroot),rhost.localslotport.value,ne.upstreamSlotport,ne.hostname.value]
-                        logging.debug(myfunc + '\t' + 
-                            "rhost_ne.isroot?: {0}, rhost.localslotport.value: {1}, ne.upstreamSlotport: {2}, NE hostname: {3}".format(*dbg_msg))
-                        # if not rhost_ne.isroot and rhost.localslotport.value != ne.upstreamSlotport:
-                        if rhost.localslotport.value != ne.upstreamSlotport:
-                            # assume it's a child
-                            rhost_ne.loo_parents.append(ne)
-                            ne.loo_children.append(rhost_ne)
-                    except:
-                        pass
-            except Exception as ex_children:
-                logging.debug(myfunc + '\t' + 
-                    "Exception identifying children based on upstream port: " + str(ex_children))
-                #ne.child_ids.append(rhost.nox_linkedNEid)
-            #logging.debug("CHILD IDS FOR '%s': %s",ne.hostname.value,str(ne.child_ids))
-            '''
-            for ne_ in crawl.loo_ne:
-                if ne_.id in ne.child_ids and not ne_.isroot:
-                    ne_.loo_parents.append(ne)
-                    ne.loo_children.append(ne_)
-            '''
-
-
-    # now summarize for child/parent list association and attach
+        if ne.isaparent and not ne.isroot and not graph.has_parent(ne.id):
+            for rhostid in graph.neighbours(ne.id,'amap'):
+                rhost_ne = graph.nodes[rhostid]
+                if (graph.port(ne.id,rhostid) != ne.upstreamSlotport and 
+                    not graph.has_parent(rhostid) and not rhost_ne.isroot):
+                    graph.set_parent(rhostid,ne.id)
+
+def assoc_from_topology(crawl):
+    ''' Generates the parents/children lists of Assoc_NE's (and 
+    loo_parents/loo_children) for every NE in the crawl from 
+    crawl.topology. The port on each Assoc_NE is the list owner's
+    port on the link or 'NA' if it isn't known.
+    '''
+    myfunc = str(giveupthefunc())
+    graph = crawl.topology
+    def gen_assoc_ne(ne,other,portsbyslotport):
+        ane = nwClasses.Assoc_NE(other.id)
+        ane.typestring = other.typestring
+        ane.hostname = other.hostname.value
+        ane.port.slotport = graph.port(ne.id,other.id)
+        if ane.port.slotport == '':
+            ane.port.slotport = 'NA'
+            ane.port.portid = 'NA'
+        elif ane.port.slotport in portsbyslotport:
+            ane.port.portid = portsbyslotport[ane.port.slotport].id
+        return ane
     for ne in crawl.loo_ne:
-        for ne_child in ne.loo_children:
-            # find ne_child in ne.amap
-            for amap in ne.type.amap.amaplist:
-                if amap.remotemac.value == ne_child.macs.macslist[0].value:
-                    # build a new associated NE with same id as child NE
-                    ane = nwClasses.Assoc_NE(ne_child.id)
-                    #ane.port = ane.Port()
-                    ane.port.slotport = amap.localslotport.value
-                    ane.hostname = ne_child.hostname.value
-                    ane.typestring = ne_child.typestring
-                    for port in ne.type.ports.portlist:
-                        if port.slotport.value == ane.port.slotport:
-                            ane.port.portid = port.id
-                    ne.children.childrenlist.append(ane)
+        if ne.id not in graph.nodes:
+            continue
+        portsbyslotport = {}
+        try:
+            for port in ne.type.ports.portlist:
+                portsbyslotport.setdefault(port.slotport.value,port)
+        except AttributeError:
+            pass
+        ne.loo_parents = [graph.nodes[i] for i in graph.parents_of(ne.id)]
+        ne.loo_children = [graph.nodes[i] for i in graph.children_of(ne.id)]
+        ne.parents.parentlist = [gen_assoc_ne(ne,x,portsbyslotport) for x in ne.loo_parents]
+        ne.children.childrenlist = [gen_assoc_ne(ne,x,portsbyslotport) for x in ne.loo_children]
         logging.debug(myfunc + '\t' + 
             "///////////////////////////////////////////")
         logging.debug(myfunc + '\t' +
@@ -1383,100 +1922,71 @@ def family_matters(crawl):
             logging.debug(myfunc + '\t' + chillen.dump())
         logging.debug(myfunc + '\t' +
             "///////////////////////////////////////////")
-        for ne_parent in ne.loo_parents:
-            # find ne_child in ne.amap
-            for amap in ne.type.amap.amaplist:
-                if amap.remotemac.value == ne_parent.macs.macslist[0].value:
-                    # build a new associated NE with same id as child NE
-                    ane = nwClasses.Assoc_NE(ne_parent.id)
-                    #ane.port = ane.Port()
-                    ane.port.slotport = amap.localslotport.value
-                    ane.hostname = ne_parent.hostname.value
-                    ane.typestring = ne_parent.typestring
-                    for port in ne.type.ports.portlist:
-                        if port.slotport.value == ane.port.slotport:
-                            ane.port.portid = port.id
-                    ne.parents.parentlist.append(ane)
 
 def roto_rooter(crawl):
     ''' Does final cleanup to shuffle the root and real root around
-    requires that peanut_gallery be run first.
+    requires that peanut_gallery be run first. Then generates the 
+    parents/children lists from crawl.topology.
     '''
     myfunc = str(giveupthefunc())
+    graph = crawl.topology
+    roots = [ne for ne in crawl.loo_ne if ne.isroot]
     # now go through and find the real root NE and strip parent
     logging.debug(myfunc + '\t' +
         "Discovering REAL root NE and stripping parent...")
     realroot_obj = None
-    for ne in crawl.loo_ne:
+    for ne in crawl.loo_ne.by_mac(crawl.realrootmac):
         try:
             if ne.macs.macslist[0].value == crawl.realrootmac:
                 logging.debug(myfunc + '\t' +
                     "Found REAL root NE with ID: " + str(ne.id))
                 ne.realroot = True
                 realroot_obj = ne
+                graph.add_node(ne)
                 # strip the parent
-                ne.parents.parentlist = []
+                graph.clear_parent(ne.id)
                 # make the root switch as the child
-                for ne_ in crawl.loo_ne:
-                    if ne_.isroot:
-                        logging.debug(myfunc + '\t' +
-                            "Found ne_.isroot with ID: " + str(ne_.id))
-                        # build a new associated NE with same id as child NE
-                        ane = nwClasses.Assoc_NE(ne_.id)
-                        #ane.port = ane.Port()
-                        ane.port.slotport = 'NA'
-                        ane.hostname = ne_.hostname.value
-                        ane.typestring = ne_.typestring
-                        ane.port.portid = 'NA'
-                        ne.children.childrenlist.append(ane)
-                    
+                for ne_ in roots:
+                    logging.debug(myfunc + '\t' +
+                        "Found ne_.isroot with ID: " + str(ne_.id))
+                    graph.add_link(ne.id,ne_.id,'route')
+                    graph.set_parent(ne_.id,ne.id)
         except Exception as ex_realroot:
             logging.debug(myfunc + '\t' + 
                 "Exception finding realroot: " + str(ex_realroot))
 
     # now find the root and remove any children listed on the upstream port
-    for ne in crawl.loo_ne:
-        if ne.isroot:
-            removallist = []
-            for idx,anec in enumerate(ne.children.childrenlist):
-                logging.debug(myfunc + '\t' +
-                    "Comparing anec.port.slotport[" + anec.port.slotport + 
-                    "] with ne.upstreamSlotport[" + ne.upstreamSlotport + "] ....(" +
-                        str(idx) + " of " + str(len(ne.children.childrenlist)-1) + ")")
-                if anec.port.slotport == ne.upstreamSlotport:
-                    logging.debug(myfunc + '\t' + 
-                        "Found an Assoc_NE on upstreamSlotport: " + str(ne.upstreamSlotport))
-                    # lookup the ne object
-                    oscar = lookup_ne_by_id(anec.id,crawl.loo_ne)
-                    # if it's the real upstream NE then we move it to parent
-                    try:
-                        if oscar.macs.macslist[0].value == crawl.realrootmac:
-                            logging.debug(myfunc + '\t' +
-                                "Found REALROOT NE with ID: " + str(oscar.id))
-                            ne.parents.parentlist.append(anec)
-                        else:
-                            # append the ne's mac to the realroot macslist
-                            realroot_obj.macs.macslist.append(oscar.macs.macslist[0])
-                            # and remove it from the crawl
-                            crawl.loo_ne.remove(oscar)
-                    except Exception as ex_oscar:
-                        logging.debug(myfunc + '\t' + 
-                            "Exception finding REALROOT NE: " + str(ex_oscar))
-                    # either way add it to list of indices to be removed
-                    removallist.append(idx)
-            # now go through and blank out the children in the removallist
-            removecount = 0
-            for i in removallist:
-                logging.debug(myfunc + '\t' +
-                    "Removing ne.children.childrenlist["+str(i)+"]")
-                removecount += 1
-                ne.children.childrenlist[i] = 'NA'
-            # now go through and actually delete those from the list
-            for i in range(0,removecount):
+    removed = set()
+    for ne in roots:
+        for childid in graph.children_of(ne.id):
+            if graph.port(ne.id,childid) != ne.upstreamSlotport:
+                continue
+            logging.debug(myfunc + '\t' + 
+                "Found an Assoc_NE on upstreamSlotport: " + str(ne.upstreamSlotport))
+            oscar = graph.nodes[childid]
+            # if it's the real upstream NE then we move it to parent
+            try:
+                if oscar.macs.macslist[0].value == crawl.realrootmac:
                     logging.debug(myfunc + '\t' +
-                        "Killing listing with 'NA'")
-                    ne.children.childrenlist.remove('NA')
-                    
+                        "Found REALROOT NE with ID: " + str(oscar.id))
+                    graph.remove_parent(childid,ne.id)
+                    graph.set_parent(ne.id,oscar.id)
+                else:
+                    # append the ne's mac to the realroot macslist
+                    realroot_obj.macs.macslist.append(oscar.macs.macslist[0])
+                    # and remove it from the crawl
+                    removed.add(oscar.id)
+            except Exception as ex_oscar:
+                logging.debug(myfunc + '\t' + 
+                    "Exception finding REALROOT NE: " + str(ex_oscar))
+    # take the removed NE's out in one go
+    if len(removed) > 0:
+        logging.debug(myfunc + '\t' +
+            "Removing " + str(len(removed)) + " upstream NE's merged into the REAL root")
+        for i in removed:
+            graph.remove_node(i)
+        crawl.loo_ne = [ne for ne in crawl.loo_ne if ne.id not in removed]
+    assoc_from_topology(crawl)
 
 def ne_audit_assocmacs(currentCrawl):
     ''' Scans through the currentCrawl NE's and 
@@ -76,6 +76,12 @@ def parseXMLInput():
                 pass
             logging.debug(myfunc + "\t" + 
                 "t_targetId = " + t_targetId)
+            # optional discovery profile, --profile on the command line wins
+            t_profile = target.attrib.get('profile',nwConfig.discoveryProfile)
+            if werd.discoveryProfile != '':
+                t_profile = werd.discoveryProfile
+            logging.debug(myfunc + "\t" + 
+                "t_profile = " + t_profile)
             logging.debug(myfunc + "\t" + 
                 str(target._children))
             t_list_entrypoint = []
@@ -251,6 +257,7 @@ def parseXMLInput():
                                             t_list_entrypoint,
                                             t_list_auth)
                 tTarget.hopdepth = 0
+                tTarget.profile = t_profile
                 werd.loo_targets.append(tTarget)
 
 
@@ -0,0 +1,786 @@
+'''
+This module holds an in-process replacement for the expect
+scripts that NetWalk normally shells out to. A Dialogue is the
+same chain of expect {} blocks that the .exp files and the
+schemaModule's expectPrefix/expectTrailer templates describe,
+just built out of Step and Choice objects instead of Tcl.
+
+All sessions are driven by a single Reactor thread that select()s
+across every open pty so one NetWalk process can keep a lot of
+devices talking at the same time without a fork/exec of expect
+(and a Tcl startup) for each pull. The transcript handed back has
+the same shape as the expect output (spawn line, echoed commands,
+"Timed Out!" style markers) so outputInspector and the parsers
+don't need to know which transport was used.
+
+'''
+
+import os
+import re
+import pty
+import time
+import errno
+import signal
+import select
+import shutil
+import subprocess
+import Queue
+import logging
+import tempfile
+import threading
+
+# internal imports
+import nwConfig
+
+CTRL_C = '\x03'
+
+def splitLines(text):
+    ''' Splits text into lines on newlines only, keeping the line
+    endings, the same way readlines() does. (splitlines() would 
+    also split on the bare carriage returns devices send and throw
+    off outputInspector's line counts.)
+    '''
+    lines = text.split('\n')
+    last = lines.pop()
+    lines = [line + '\n' for line in lines]
+    if last != '':
+        lines.append(last)
+    return lines
+
+class Choice(object):
+    ''' One branch of an expect {} block. When the regex matches
+    the session output the send string (if any) is written to
+    the session and then one of the following happens:
+        abort   - the session ends and the abort string is added
+                  to the transcript (same as puts "Timed Out!"; exit 1)
+        repeat  - stay on the current step (e.g., the yes/no prompt
+                  that comes before the password prompt)
+        steps   - the rest of the dialogue is replaced by these steps
+    otherwise the dialogue moves on to the next step.
+    '''
+    def __init__(self,regex,send=None,abort=None,repeat=False,steps=None):
+        self.pattern = regex
+        self.regex = re.compile(regex)
+        self.send = send
+        self.abort = abort
+        self.repeat = repeat
+        self.steps = steps
+
+class Watch(object):
+    ''' A failure marker that is looked for in everything the 
+    session prints no matter which step the dialogue is on, so a
+    pull that has already failed is cut short instead of sitting 
+    through the rest of its timeouts. code names the failure, 
+    marker is the line added to the transcript for outputInspector
+    (None if the matching line already says enough) and fatal 
+    means trying again won't help.
+    '''
+    def __init__(self,code,regex,marker=None,fatal=False):
+        self.code = code
+        self.regex = re.compile(regex)
+        self.marker = marker
+        self.fatal = fatal
+
+class Failure(object):
+    ''' Why a session was cut short. Handed back to the caller so
+    the retry logic doesn't have to dig through the transcript.
+    '''
+    def __init__(self,code,marker=None,line=None,fatal=False):
+        self.code = code
+        self.marker = marker
+        self.line = line
+        self.fatal = fatal
+    def __str__(self):
+        msg = self.code
+        if self.line != None:
+            msg += " (" + self.line.strip() + ")"
+        return msg
+
+class OutputWatcher(object):
+    ''' Checks output against a list of Watches as it comes in. 
+    Output can arrive in any size of chunk so the unfinished last
+    line is held over and checked again with the next chunk.
+    '''
+    def __init__(self,watches):
+        self.watches = watches
+        self.partial = ''
+    def feed(self,data):
+        ''' Returns a Failure for the first Watch that matches or
+        None.
+        '''
+        text = self.partial + data
+        self.partial = text[text.rfind('\n')+1:]
+        for watch in self.watches:
+            match = watch.regex.search(text)
+            if match:
+                start = text.rfind('\n',0,match.start()) + 1
+                end = text.find('\n',match.end())
+                if end == -1:
+                    end = len(text)
+                return Failure(watch.code,watch.marker,text[start:end],watch.fatal)
+        return None
+    def classify(self,reason):
+        ''' Works out the Failure for an abort or timeout marker
+        that the dialogue itself added to the transcript.
+        '''
+        for watch in self.watches:
+            if watch.regex.search(reason):
+                return Failure(watch.code,None,reason,watch.fatal)
+        return Failure('abort',None,reason)
+
+class Step(object):
+    ''' Equivalent of a single expect {} block. The choices are
+    checked in order just like expect does. If nothing matches
+    before timeout seconds the session ends, with ontimeout
+    added to the transcript if one was given (like the
+    'timeout {send $CTRL_C; puts "Timed Out!"; exit 1}' clause).
+    '''
+    def __init__(self,choices,timeout,ontimeout=None):
+        self.choices = choices
+        self.timeout = float(timeout)
+        self.ontimeout = ontimeout
+
+class Dialogue(object):
+    ''' Holds the command to spawn (usually ssh) and the list of
+    Steps to walk through once it's running.
+
+    If legs (one hashable key per hop, e.g. (ip,username)) and
+    legsteps (the login Steps for each hop) are given the login
+    is kept separate from the payload steps so the SessionCache
+    can pick the session up at whatever hop it was left at. 
+    unwind holds the Steps that log out of the innermost hop and
+    settle the Steps that wait for the device to go quiet before
+    the session is parked. watch is a list of Watches that end the
+    session early when the output shows the pull has failed.
+    '''
+    def __init__(self,argv,steps,legs=None,legsteps=None,unwind=None,settle=None,
+            watch=None):
+        self.argv = argv
+        self.steps = steps
+        self.legs = legs
+        self.legsteps = legsteps
+        self.unwind = unwind
+        self.settle = settle
+        self.watch = watch
+        # set once the dialogue has run, None if nothing went wrong
+        self.failure = None
+    def allsteps(self):
+        ''' Returns the full list of steps for a fresh spawn.
+        '''
+        steps = []
+        if self.legsteps != None:
+            for legstep in self.legsteps:
+                steps += legstep
+        return steps + self.steps
+
+class Session(object):
+    ''' Runs one Dialogue on its own pty. The Reactor feeds it
+    output with feed() and checks expire() for timeouts.
+
+    When keepopen is set the session is parked (idle) instead of
+    closed once the steps run out so resume() can hand it more
+    steps later on.
+
+    If the dialogue has a watch list the session is ended as soon as
+    one of them shows up in the output and the reason is kept in
+    failure.
+    '''
+    def __init__(self,dialogue,keepopen=False):
+        self.dialogue = dialogue
+        self.steps = dialogue.allsteps()
+        self.keepopen = keepopen
+        self.buffer = ''
+        self.chunks = []
+        # when set, complete lines go on this queue instead of chunks
+        self.linequeue = None
+        self.partial = ''
+        self.pid = None
+        self.fd = None
+        self.deadline = None
+        self.idle = False
+        self.idlesince = None
+        self.finished = False
+        self.abortreason = None
+        self.failure = None
+        self.watcher = None
+        if dialogue.watch != None:
+            self.watcher = OutputWatcher(dialogue.watch)
+        self.lock = threading.RLock()
+        self.rundone = threading.Event()
+        self.done = threading.Event()
+        # functions to call once the session is closed
+        self.onclose = []
+    def spawn(self):
+        argv = self.dialogue.argv
+        pid, fd = pty.fork()
+        if pid == 0:
+            try:
+                os.execvp(argv[0],argv)
+            finally:
+                os._exit(1)
+        self.pid = pid
+        self.fd = fd
+        self.emit('spawn ' + ' '.join(argv) + '\r\n')
+        self.resetdeadline()
+    def resume(self,steps,linequeue=None):
+        ''' Hands a parked session a new set of steps. Anything the
+        session printed while idle is dropped and a return is sent
+        to bring up a fresh prompt for the first step to match.
+        '''
+        with self.lock:
+            if self.finished:
+                return False
+            self.rundone.clear()
+            self.chunks = []
+            self.linequeue = linequeue
+            self.partial = ''
+            self.buffer = ''
+            self.idle = False
+            self.abortreason = None
+            self.failure = None
+            if self.watcher != None:
+                self.watcher.partial = ''
+            self.steps = list(steps)
+            self.resetdeadline()
+            self.send('\r')
+        return True
+    def resetdeadline(self):
+        if len(self.steps) > 0:
+            self.deadline = time.time() + self.steps[0].timeout
+        else:
+            self.deadline = None
+    def send(self,text):
+        try:
+            os.write(self.fd,text)
+        except OSError as ex_write:
+            logging.debug("nwTransport.Session.send(): " +
+                "Exception writing to session: " + str(ex_write))
+            self.finish()
+    def feed(self,data):
+        ''' Takes new output from the pty and moves the dialogue
+        along as far as it will go.
+        '''
+        with self.lock:
+            if self.idle:
+                return
+            self.emit(data)
+            if self.watcher != None:
+                failure = self.watcher.feed(data)
+                if failure != None:
+                    self.fail(failure)
+                    return
+            self.buffer += data
+            self.advance()
+    def advance(self):
+        while not self.finished and len(self.steps) > 0:
+            step = self.steps[0]
+            matched = None
+            for choice in step.choices:
+                match = choice.regex.search(self.buffer)
+                if match:
+                    matched = (choice,match)
+                    break
+            if matched == None:
+                return
+            choice,match = matched
+            # like expect, everything up to the match is consumed
+            self.buffer = self.buffer[match.end():]
+            if choice.send != None:
+                self.send(choice.send)
+            if choice.abort != None:
+                self.finish(choice.abort)
+                return
+            if choice.repeat:
+                pass
+            elif choice.steps != None:
+                self.steps = list(choice.steps)
+            else:
+                self.steps.pop(0)
+            self.resetdeadline()
+        if len(self.steps) == 0 and not self.finished:
+            if self.keepopen:
+                self.idle = True
+                self.idlesince = time.time()
+                self.deadline = None
+                self.endrun()
+            else:
+                self.finish()
+    def expire(self):
+        ''' Called by the Reactor once the current step has run
+        past its timeout.
+        '''
+        with self.lock:
+            if self.idle or self.finished or len(self.steps) == 0:
+                return
+            step = self.steps[0]
+            if step.ontimeout != None:
+                self.send(CTRL_C)
+            self.finish(step.ontimeout)
+    def fail(self,failure):
+        ''' Ends the session early because a Watch matched.
+        '''
+        logging.debug("nwTransport.Session.fail(): " +
+            "Ending session early on failure: " + str(failure))
+        self.failure = failure
+        self.send(CTRL_C)
+        self.finish(failure.marker)
+    def finish(self,reason=None):
+        with self.lock:
+            if self.finished:
+                return
+            self.finished = True
+            self.idle = False
+            if reason != None:
+                self.abortreason = reason
+                if self.failure == None and self.watcher != None:
+                    self.failure = self.watcher.classify(reason)
+                self.emit(reason + '\n')
+    def close(self):
+        ''' Closes the pty and reaps the spawned process.
+        '''
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+        try:
+            os.kill(self.pid,signal.SIGTERM)
+        except OSError:
+            pass
+        for i in range(0,20):
+            try:
+                pid,status = os.waitpid(self.pid,os.WNOHANG)
+            except OSError:
+                break
+            if pid != 0:
+                break
+            time.sleep(0.05)
+        else:
+            try:
+                os.kill(self.pid,signal.SIGKILL)
+                os.waitpid(self.pid,0)
+            except OSError:
+                pass
+        for func in self.onclose:
+            try:
+                func()
+            except Exception as ex_onclose:
+                logging.debug("nwTransport.Session.close(): " +
+                    "Exception in onclose function: " + str(ex_onclose))
+        with self.lock:
+            self.endrun()
+        self.done.set()
+    def emit(self,data):
+        ''' Adds output to the transcript of the current run. When
+        streaming, only complete lines are passed on.
+        '''
+        if self.linequeue == None:
+            self.chunks.append(data)
+            return
+        lines = splitLines(self.partial + data)
+        self.partial = ''
+        if len(lines) > 0 and not lines[-1].endswith('\n'):
+            self.partial = lines.pop()
+        for line in lines:
+            self.linequeue.put(line)
+    def endrun(self):
+        ''' Marks the current run as done, handing any streaming 
+        reader the last partial line and the end marker.
+        '''
+        if self.rundone.is_set():
+            return
+        if self.linequeue != None:
+            if self.partial != '':
+                self.linequeue.put(self.partial)
+                self.partial = ''
+            self.linequeue.put(None)
+        self.rundone.set()
+    def lines(self):
+        ''' Returns the transcript as a list of lines the same way
+        os.popen().readlines() would.
+        '''
+        with self.lock:
+            return splitLines(''.join(self.chunks))
+
+class Reactor(threading.Thread):
+    ''' Single thread that multiplexes every running Session.
+    Sessions are spawned by the calling thread then handed over
+    with submit(); the Reactor is woken up through a pipe.
+    '''
+    def __init__(self):
+        threading.Thread.__init__(self,name="nwTransport-Reactor")
+        self.daemon = True
+        self.sessions = {}
+        self.pending = []
+        self.lock = threading.Lock()
+        self.wakeup_r, self.wakeup_w = os.pipe()
+    def submit(self,session):
+        session.spawn()
+        with self.lock:
+            self.pending.append(session)
+        self.wakeup()
+    def wakeup(self):
+        os.write(self.wakeup_w,'x')
+    def run(self):
+        while True:
+            with self.lock:
+                for session in self.pending:
+                    self.sessions[session.fd] = session
+                self.pending = []
+            timeout = None
+            deadlines = [s.deadline for s in self.sessions.values() 
+                            if s.deadline != None]
+            if len(deadlines) > 0:
+                timeout = max(0,min(deadlines) - time.time())
+            fds = self.sessions.keys() + [self.wakeup_r]
+            try:
+                readable,w,x = select.select(fds,[],[],timeout)
+            except select.error as ex_select:
+                if ex_select.args[0] == errno.EINTR:
+                    continue
+                raise
+            for fd in readable:
+                if fd == self.wakeup_r:
+                    os.read(self.wakeup_r,1024)
+                    continue
+                session = self.sessions[fd]
+                try:
+                    data = os.read(fd,4096)
+                except OSError:
+                    # linux gives EIO once the other end of the pty closes
+                    data = ''
+                if data:
+                    session.feed(data)
+                else:
+                    session.finish()
+            now = time.time()
+            for fd,session in self.sessions.items():
+                if (not session.finished and session.deadline != None and 
+                        now >= session.deadline):
+                    session.expire()
+                if session.finished:
+                    del self.sessions[fd]
+                    session.close()
+
+reactorlock = threading.Lock()
+reactor = None
+
+def getReactor():
+    ''' Returns the shared Reactor, starting it the first time
+    it is needed.
+    '''
+    global reactor
+    with reactorlock:
+        if reactor == None:
+            reactor = Reactor()
+            reactor.start()
+    return reactor
+
+class SessionCache(object):
+    ''' Keeps parked sessions around keyed by the tuple of legs
+    they are logged in through so a later dialogue for the same
+    device (or a sibling behind the same jump host) can pick up
+    where the last one left off instead of logging in again.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = []
+    def checkout(self,legs):
+        ''' Returns (session,depth,key) for the idle session that
+        shares the longest chain of legs with the request, or 
+        (None,0,None) if there isn't one. depth is how many of
+        the requested legs are already logged in once the 
+        session has been unwound to the shared part.
+        '''
+        legs = tuple(legs)
+        best = None
+        with self.lock:
+            for entry in list(self.idle):
+                key,session = entry
+                if session.finished or (time.time() - session.idlesince >
+                        nwConfig.transportIdleTimeout):
+                    self.idle.remove(entry)
+                    self.discard(session)
+                    continue
+                common = 0
+                for a,b in zip(key,legs):
+                    if a != b:
+                        break
+                    common += 1
+                if common == 0:
+                    continue
+                if best == None or common > best[0]:
+                    best = (common,entry)
+            if best == None:
+                return (None,0,None)
+            common,entry = best
+            self.idle.remove(entry)
+        key,session = entry
+        return (session,common,key)
+    def checkin(self,legs,session):
+        ''' Parks a session. The oldest idle sessions are closed 
+        once there are more than nwConfig.transportMaxIdle, or more
+        than nwConfig.maxSessionsPerJumpHost parked behind the same
+        jump host (first leg) since those are still logged in 
+        through it.
+        '''
+        legs = tuple(legs)
+        with self.lock:
+            self.idle.append((legs,session))
+            if len(legs) > 1:
+                behind = [entry for entry in self.idle 
+                    if len(entry[0]) > 1 and entry[0][0][0] == legs[0][0]]
+                extra = len(behind) - max(1,nwConfig.maxSessionsPerJumpHost)
+                for entry in behind[:max(0,extra)]:
+                    self.idle.remove(entry)
+                    self.discard(entry[1])
+            while len(self.idle) > nwConfig.transportMaxIdle:
+                key,oldest = self.idle.pop(0)
+                self.discard(oldest)
+    def discard(self,session):
+        session.finish()
+        getReactor().wakeup()
+    def closeall(self):
+        with self.lock:
+            idle = self.idle
+            self.idle = []
+        for key,session in idle:
+            self.discard(session)
+        for key,session in idle:
+            session.done.wait()
+
+sessioncache = SessionCache()
+
+class Tunnel(object):
+    ''' One authenticated ssh session to a jump host that other 
+    sessions ride on through OpenSSH connection sharing (-M/-S) 
+    so they skip the jump host login.
+    '''
+    def __init__(self,key,controlpath):
+        self.key = key
+        self.controlpath = controlpath
+        self.refcount = 0
+        self.master = None
+        self.ok = False
+        self.ready = threading.Event()
+    def open(self,dialogue):
+        ''' Logs the master session in using the first leg of the 
+        dialogue and leaves it parked.
+        '''
+        argv = (dialogue.argv[:1] + ['-M','-S',self.controlpath] + 
+                dialogue.argv[1:])
+        masterdialogue = Dialogue(argv,dialogue.settle or [],
+                            legsteps=dialogue.legsteps[:1],
+                            watch=dialogue.watch)
+        self.master = Session(masterdialogue,keepopen=True)
+        getReactor().submit(self.master)
+        self.master.rundone.wait()
+        self.ok = self.master.idle and not self.master.finished
+        if not self.ok:
+            logging.debug("nwTransport.Tunnel.open(): " +
+                "Unable to open tunnel to " + str(self.key) + ": " + 
+                str(self.master.abortreason))
+        self.ready.set()
+    def childargv(self,argv):
+        return argv[:1] + ['-S',self.controlpath] + argv[1:]
+    def close(self):
+        # this can run on the Reactor thread (from a Session's onclose)
+        #  so just flag the master and let the Reactor close it
+        if self.master != None:
+            self.master.finish()
+            getReactor().wakeup()
+        try:
+            os.remove(self.controlpath)
+        except OSError:
+            pass
+
+class TunnelManager(object):
+    ''' Hands out ref-counted Tunnels, one per jump host. The 
+    tunnel is opened by the first session that needs it and 
+    closed when the last session riding on it is closed.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tunnels = {}
+        self.controldir = None
+        self.counter = 0
+    def acquire(self,dialogue):
+        ''' Returns an open Tunnel for the first leg of the dialogue
+        or None if the jump host login failed.
+        '''
+        key = dialogue.legs[0]
+        opener = False
+        with self.lock:
+            if self.controldir == None:
+                self.controldir = tempfile.mkdtemp(prefix='nw-')
+            tunnel = self.tunnels.get(key)
+            if tunnel == None:
+                self.counter += 1
+                controlpath = os.path.join(self.controldir,
+                                'tunnel-' + str(self.counter))
+                tunnel = Tunnel(key,controlpath)
+                self.tunnels[key] = tunnel
+                opener = True
+            tunnel.refcount += 1
+        if opener:
+            tunnel.open(dialogue)
+        tunnel.ready.wait()
+        if not tunnel.ok:
+            self.release(tunnel)
+            return None
+        return tunnel
+    def release(self,tunnel):
+        with self.lock:
+            tunnel.refcount -= 1
+            if tunnel.refcount > 0:
+                return
+            if self.tunnels.get(tunnel.key) is tunnel:
+                del self.tunnels[tunnel.key]
+        logging.debug("nwTransport.TunnelManager.release(): " +
+            "Closing tunnel to " + str(tunnel.key))
+        tunnel.close()
+    def closeall(self):
+        ''' Removes the control socket directory if no tunnels are
+        left open. Otherwise it is kept for them and new tunnels.
+        '''
+        with self.lock:
+            if self.controldir == None or len(self.tunnels) > 0:
+                return
+            controldir = self.controldir
+            self.controldir = None
+        shutil.rmtree(controldir,True)
+
+tunnels = TunnelManager()
+
+def spawnSession(dialogue,keepopen=False,linequeue=None):
+    ''' Starts a fresh Session for the dialogue. Sessions to hop 1
+    and hop 2 devices are started through the jump host's Tunnel
+    when nwConfig.transportTunnels is on, so only the nested logins
+    are run.
+    '''
+    tunnel = None
+    if (nwConfig.transportTunnels and dialogue.legs != None and 
+            len(dialogue.legs) > 1):
+        tunnel = tunnels.acquire(dialogue)
+    if tunnel != None:
+        child = Dialogue(tunnel.childargv(dialogue.argv),dialogue.steps,
+                    legs=dialogue.legs,
+                    legsteps=[[]] + dialogue.legsteps[1:],
+                    unwind=dialogue.unwind,
+                    settle=dialogue.settle,
+                    watch=dialogue.watch)
+        session = Session(child,keepopen)
+        session.onclose.append(lambda: tunnels.release(tunnel))
+    else:
+        session = Session(dialogue,keepopen)
+    if keepopen and dialogue.settle != None:
+        session.steps = session.steps + dialogue.settle
+    session.linequeue = linequeue
+    getReactor().submit(session)
+    return session
+
+def startDialogue(dialogue,linequeue=None):
+    ''' Starts the dialogue on the shared Reactor, picking up a
+    parked session from the sessioncache when nwConfig.transportReuse
+    is on, and returns the Session running it.
+    '''
+    logging.info("nwTransport.startDialogue()" + '\t' + nwConfig.rob +
+        ' '.join(dialogue.argv))
+    reuse = nwConfig.transportReuse and dialogue.legs != None
+    if not reuse:
+        return spawnSession(dialogue,linequeue=linequeue)
+    payload = list(dialogue.steps)
+    if dialogue.settle != None:
+        payload += dialogue.settle
+    session,depth,key = sessioncache.checkout(dialogue.legs)
+    if session != None:
+        steps = []
+        # log out of the hops we don't share with this dialogue
+        for i in range(depth,len(key)):
+            steps += dialogue.unwind
+        for legstep in dialogue.legsteps[depth:]:
+            steps += legstep
+        logging.debug("nwTransport.startDialogue(): " +
+            "Reusing session at hop " + str(depth) + " of " + 
+            str(len(dialogue.legs)) + " for " + str(dialogue.legs))
+        if session.resume(steps + payload,linequeue):
+            # the Reactor may be sleeping with no deadline to wake it
+            getReactor().wakeup()
+            return session
+    return spawnSession(dialogue,keepopen=True,linequeue=linequeue)
+
+def endDialogue(dialogue,session):
+    ''' Waits for the current run of the session to finish and
+    then parks it in the sessioncache or waits for it to close.
+    '''
+    session.rundone.wait()
+    dialogue.failure = session.failure
+    if session.keepopen and session.idle and not session.finished:
+        sessioncache.checkin(dialogue.legs,session)
+    else:
+        session.done.wait()
+
+def runDialogue(dialogue):
+    ''' Runs the dialogue and blocks until it is done. Returns 
+    the transcript as a list of lines.
+    '''
+    session = startDialogue(dialogue)
+    session.rundone.wait()
+    lines = session.lines()
+    endDialogue(dialogue,session)
+    return lines
+
+def streamDialogue(dialogue):
+    ''' Generator version of runDialogue() that hands back each
+    line of the transcript as soon as it has come in, so the 
+    whole transcript never has to be held in memory.
+    '''
+    linequeue = Queue.Queue()
+    session = startDialogue(dialogue,linequeue)
+    try:
+        while True:
+            line = linequeue.get()
+            if line == None:
+                break
+            yield line
+    finally:
+        endDialogue(dialogue,session)
+
+def watchCommand(commandstringraw,watches):
+    ''' Runs an OS command (i.e., an expect script) like 
+    os.popen().readlines() but checks each line against the 
+    watches as it comes in. The command and everything it spawned
+    is killed as soon as one matches. Returns a tuple of the
+    output lines and the Failure (None if it ran clean).
+    '''
+    logging.info("nwTransport.watchCommand()" + '\t' + nwConfig.rob +
+        commandstringraw)
+    watcher = OutputWatcher(watches)
+    # own process group so the ssh that expect spawned goes too
+    proc = subprocess.Popen(commandstringraw,shell=True,
+                stdout=subprocess.PIPE,preexec_fn=os.setsid)
+    lines = []
+    failure = None
+    for line in iter(proc.stdout.readline,''):
+        lines.append(line)
+        failure = watcher.feed(line)
+        if failure != None:
+            break
+    if failure != None:
+        logging.debug("nwTransport.watchCommand(): " +
+            "Killing command early on failure: " + str(failure))
+        try:
+            os.killpg(proc.pid,signal.SIGTERM)
+        except OSError:
+            pass
+        if failure.marker != None:
+            lines.append(failure.marker + '\n')
+    proc.stdout.close()
+    proc.wait()
+    return (lines,failure)
+
+def closeIdleSessions():
+    ''' Logs out of every parked session. Called once the crawl
+    is done with the devices.
+    '''
+    sessioncache.closeall()
+    tunnels.closeall()
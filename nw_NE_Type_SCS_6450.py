@@ -11,6 +11,8 @@ import nwConfig
 
 # internal imports
 from nwClasses import werd # super important that this is first
+from nwClasses import regexes
+from nwClasses import RegexSet
 
 ''' list of dictionaries that contain the commands to run on the router/switch
 to pull all of the data desired. Split up into a type identifier followed by a list
@@ -71,6 +73,32 @@ discoveryCommands = [
 
     ]
 
+''' named discovery profiles. Each one picks the discoveryCommands a pull
+runs, 'commands' of None meaning all of them. A command's output runs up
+to the next command in the list so the last command only closes off the
+one before it, keep it at the end of every profile. 'minimumoutput' is
+the fewest lines of output that count as a good pull, None means the
+parser module's minimum_discoveryoutputlength.
+'''
+discoveryProfiles = {
+    'full':         {   'commands':         None,
+                        'minimumoutput':    None,
+                    },
+    # just what the amap links and the parent/child relationships are built from
+    'topology':     {   'commands':     [   'show interfaces',
+                                            'show interfaces status',
+                                            'show chassis',
+                                            'show ip router database',
+                                            'show ip interface',
+                                            'show arp',
+                                            'show amap',
+                                            'show mac-address-table',
+                                            'show udld configuration',
+                                        ],
+                        'minimumoutput':    100,
+                    },
+    }
+
 class BaseClass():
     ''' Basic class to hold basic properties
     for the purposes of inheritance.
@@ -589,7 +617,7 @@ class TypeContainer_ALU_SCS():
             xmlparent = 'configuration'
         def __init__(self):
             self.text = self.Text()
-    def __init__(self):
+    def __init__(self,profile='full'):
         self.ports = self.PortsContainer()
         self.vlans = self.VlanContainer()
         self.modules = self.ModuleContainer()
@@ -601,20 +629,30 @@ class TypeContainer_ALU_SCS():
         self.arptable = self.ArpTable()
         self.amap = self.AmapContainer()
         # prepend non-xml related props with nox
+        # name of the discoveryProfiles entry the pull runs
+        self.nox_discoveryprofile = profile
+        self.nox_minimumoutputlength = discoveryProfiles[profile].get('minimumoutput')
         self.nox_discoverycommandlist = self.genDiscoveryCommandList()
         self.nox_expectbody = self.genExpectBody()
-        # holder for the filename of the discovery expect script
+        # holder for the filename of the (shared) discovery expect script
         self.nox_discoveryexpectscript = ''
+        # unique name for this NE's discovery output log
+        self.nox_discoverylogname = ''
         self.nox_discoveryexpectcommand = ''
         self.nox_discoveryoutput = []
+        # holder for the DiscoveryStream when the output is parsed as it comes in
+        self.nox_discoverystream = None
     def genDiscoveryCommandList(self):
         # build the discovery command list from the discoveryCommands
         #  list of dictionaries imported at the top of this module
+        #  narrowed down to the commands in the discovery profile
+        profilecommands = discoveryProfiles[self.nox_discoveryprofile].get('commands')
         templist = []
         for chunk in discoveryCommands:
             if chunk.get('type') == self.typestring:
                 for command in chunk.get('commands'):
-                    templist.append(command)
+                    if profilecommands == None or command in profilecommands:
+                        templist.append(command)
         return templist
     def genExpectBody(self):
         ''' Takes the discovery command list and builds the
@@ -648,11 +686,13 @@ class TypeContainer_ALU_SCS():
                 # add the closing curly braces, two for every command
                 body += (endchar * (len(lister)*2))
         return body
+    def discoveryOutputFilename(self):
+        return self.nox_discoverylogname + "-output.log"
     def dumpDiscoveryOutputToFile(self):
         ''' Takes the content in self.nox_discoveryoutput and
         dumps to filename modeled after expect script name. 
         '''
-        filename = self.nox_discoveryexpectscript + "-output.log"
+        filename = self.discoveryOutputFilename()
         with open(filename,'wb') as f:
             for line in self.nox_discoveryoutput:
                 f.write(line)
@@ -970,14 +1010,14 @@ class CommandOutput():
         # format: ['want':'slotport','identifier':idobject]
         self.thingsiwant = []
     def genregex_commandstring(self):
-        ''' Generates a regex for the commandstring
+        ''' Fetches the regex for the commandstring from the registry
         '''
-        return(re.compile(self.commandstring))
+        return(regexes.get(self.commandstring))
     def check_match(self,linestring):
         ''' Takes a line of data as input and returns
         true if a match was found.
         '''
-        match = re.search(self.commandstring_regex,linestring)
+        match = self.commandstring_regex.search(linestring)
         if match:
             return True
         else:
@@ -995,12 +1035,12 @@ class RegexIdentifier_SingleLine():
             "(?P<indicator>" + identifierstring + ")" +
             "(?P<value>" + valuestring + ")"
             )
-        self.regex = re.compile(self.stringer)
+        self.regex = regexes.get(self.stringer)
     def check_match(self,linestring):
         ''' Takes a line of data as input and returns
         true if a match was found.
         '''
-        match = re.search(self.regex,linestring)
+        match = self.regex.search(linestring)
         if match:
             return True
         else:
@@ -1009,21 +1049,23 @@ class RegexIdentifier_SingleLine():
         ''' takes a line of data as input and returns
         the contents of the 'value' ?P group
         '''
-        match = re.search(self.regex,linestring)
+        match = self.regex.search(linestring)
         if match:
-            value = match.group('value')
-            # strip out unwanted chars
-            try:
-                value = value.rstrip(',\n\r') 
-            except Exception as e:
-                msg = "RegexIdentifier_SingleLine(): "
-                msg +=" give_group_value(): Exception "
-                msg += "processing value: " + str(e)
-                logging.debug("\t" + msg)
-                value = ''
-            return value
+            return self.clean_value(match.group('value'))
         else:
             return("NO_MATCH!")
+    def clean_value(self,value):
+        ''' strips the unwanted chars off a matched 'value' group
+        '''
+        try:
+            value = value.rstrip(',\n\r') 
+        except Exception as e:
+            msg = "RegexIdentifier_SingleLine(): "
+            msg +=" give_group_value(): Exception "
+            msg += "processing value: " + str(e)
+            logging.debug("\t" + msg)
+            value = ''
+        return value
 
 class ElementIdentifier():
     ''' Takes a string as a source command
@@ -1035,6 +1077,28 @@ class ElementIdentifier():
         self.sourcecommand = sourcecommand
         self.identifier = RegexIdentifier_SingleLine(identifierstring,valuestring)
 
+class IdentifierSet():
+    ''' Takes the place of an if/elif chain of ElementIdentifier
+    check_match() calls over the same lines. Each line gets one
+    combined search and first_match() returns the identifier the
+    elif chain would have picked along with its value, or
+    (None,None) when nothing matches.
+    '''
+    def __init__(self,identifiers):
+        self.identifiers = identifiers
+        self.regexset = RegexSet([i.identifier.stringer for i in identifiers])
+    def first_match(self,linestring):
+        index,groups = self.regexset.first_match(linestring)
+        if index == None:
+            return (None,None)
+        ident = self.identifiers[index]
+        return (ident,ident.identifier.clean_value(groups.get('value')))
+
+''' regex for matching an IP address, used to strip tables down
+to their data lines
+'''
+re_ip = regexes.get("\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}")
+
 
 class Parser_Port():
     ''' Class to handle port parsing. Holds 
@@ -1217,6 +1281,7 @@ class Parser_Port():
         id_mac = ElementIdentifier('show interfaces',
                                     "  MAC address            : ",
                                     "([0-9A-Fa-f]{2}[-:]){5}[0-9A-Fa-f]{2})|(([0-9A-Fa-f]{4}.){2}[0-9A-Fa-f]{4}")
+        ids_chunk = IdentifierSet([id_operstatus,id_sfp,id_mac])
         def __init__(self,text):
             self.alltext = text
             self.elementlist = self.chunkdata()
@@ -1250,12 +1315,13 @@ class Parser_Port():
             '''
             for element in self.elementlist:
                 for line in element.chunk:
-                    if self.id_operstatus.identifier.check_match(line):
-                        element.operstatus = self.id_operstatus.identifier.give_group_value(line)
-                    elif self.id_sfp.identifier.check_match(line):
-                        element.sfp = self.id_sfp.identifier.give_group_value(line)
-                    elif self.id_mac.identifier.check_match(line):
-                        element.mac = self.id_mac.identifier.give_group_value(line)
+                    ident,value = self.ids_chunk.first_match(line)
+                    if ident is self.id_operstatus:
+                        element.operstatus = value
+                    elif ident is self.id_sfp:
+                        element.sfp = value
+                    elif ident is self.id_mac:
+                        element.mac = value
         def dump(self):
             msg = "ChunkParser_ShowInt():\n\r"
             for e in self.elementlist:
@@ -1384,31 +1450,42 @@ class Parser_Port():
     def finalize_ports(self):
         ''' takes the portlist and then checks the other
         two lists for slotports of the same and fills in 
-        the rest of the data.
-        '''
+        the rest of the data. Each list is indexed by slotport
+        once (the last element for a slotport wins, same as 
+        scanning the whole list per port) and the mac table 
+        is grouped by slotport in table order.
+        '''
+        statusbyslotport = {}
+        for element in self.ints_status.elementlist:
+            statusbyslotport[element.slotport] = element
+        macsbyslotport = {}
+        for element in self.mac_table.elementlist:
+            macsbyslotport.setdefault(element.slotport,[]).append(element)
+        intsbyslotport = {}
+        for element in self.ints.elementlist:
+            intsbyslotport[element.slotport] = element
         for port in self.portlist:
-            for element in self.ints_status.elementlist:
-                if port.slotport == element.slotport:
-                    port.autonegotiate = element.autonegotiate
-                    port.detected_speed = element.detected_speed
-                    port.detected_duplex = element.detected_duplex
-                    port.detected_hybrid = element.detected_hybrid
-                    port.configured_speed = element.configured_speed
-                    port.configured_duplex = element.configured_duplex
-                    port.configured_hybrid = element.configured_hybrid
-            for element in self.mac_table.elementlist:
-                if port.slotport == element.slotport:
-                    tmac = port.AssocMac()
-                    tmac.vlan = element.vlan
-                    tmac.mac = element.mac
-                    tmac.typestring = element.typestring
-                    tmac.slotport = element.slotport
-                    port.associatedmacs.append(tmac)
-            for element in self.ints.elementlist:
-                if port.slotport == element.slotport:
-                    port.operstatus = element.operstatus
-                    port.sfp = element.sfp
-                    port.mac = element.mac
+            element = statusbyslotport.get(port.slotport)
+            if element != None:
+                port.autonegotiate = element.autonegotiate
+                port.detected_speed = element.detected_speed
+                port.detected_duplex = element.detected_duplex
+                port.detected_hybrid = element.detected_hybrid
+                port.configured_speed = element.configured_speed
+                port.configured_duplex = element.configured_duplex
+                port.configured_hybrid = element.configured_hybrid
+            for element in macsbyslotport.get(port.slotport,[]):
+                tmac = port.AssocMac()
+                tmac.vlan = element.vlan
+                tmac.mac = element.mac
+                tmac.typestring = element.typestring
+                tmac.slotport = element.slotport
+                port.associatedmacs.append(tmac)
+            element = intsbyslotport.get(port.slotport)
+            if element != None:
+                port.operstatus = element.operstatus
+                port.sfp = element.sfp
+                port.mac = element.mac
     def dumpfull(self):
         msg = ''
         msg += self.ints.dump()
@@ -1569,11 +1646,8 @@ class TableParser_ShowIpInterface():
                 self.text = cmd.sectionoutput
     def stripextra(self,text):
         temp = []
-        # define regex for matching an IP address
-        import re
-        re_ip = re.compile("\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}")
         for i,line in enumerate(text):
-            re_ip_match = re.search(re_ip,line)
+            re_ip_match = re_ip.search(line)
             if re_ip_match:
                 temp.append(line)
         # now have temp list with only the lines with an IP
@@ -1644,6 +1718,8 @@ class SectionParser_ShowChassis():
         id_serial = ElementIdentifier('show chassis',
                                     "  Serial Number:                 ",
                                     ".*")
+        ids_chassis = IdentifierSet([id_model,id_description,id_adminstatus,
+                                    id_operstatus,id_mac,id_serial])
         def __init__(self,loo_commandlist):
             self.text = []
             self.attach_relevant_commandos(loo_commandlist)
@@ -1669,18 +1745,19 @@ class SectionParser_ShowChassis():
             '''
             element = self.Element()
             for line in self.text:
-                if self.id_model.identifier.check_match(line):
-                    element.model = self.id_model.identifier.give_group_value(line)
-                elif self.id_description.identifier.check_match(line):
-                    element.description = self.id_description.identifier.give_group_value(line)
-                elif self.id_adminstatus.identifier.check_match(line):
-                    element.adminstatus = self.id_adminstatus.identifier.give_group_value(line)
-                elif self.id_operstatus.identifier.check_match(line):
-                    element.operstatus = self.id_operstatus.identifier.give_group_value(line)
-                elif self.id_mac.identifier.check_match(line):
-                    element.mac = self.id_mac.identifier.give_group_value(line)
-                elif self.id_serial.identifier.check_match(line):
-                    element.serial = self.id_serial.identifier.give_group_value(line)
+                ident,value = self.ids_chassis.first_match(line)
+                if ident is self.id_model:
+                    element.model = value
+                elif ident is self.id_description:
+                    element.description = value
+                elif ident is self.id_adminstatus:
+                    element.adminstatus = value
+                elif ident is self.id_operstatus:
+                    element.operstatus = value
+                elif ident is self.id_mac:
+                    element.mac = value
+                elif ident is self.id_serial:
+                    element.serial = value
             return(element)
         def dump(self):
             msg = "SectionParser_ShowChassis():\n\r"
@@ -1987,6 +2064,9 @@ class Parser_Module():
         id_gbic_laserwavelength = ElementIdentifier('show module long',
                                     "        Laser Wave Length:             ",
                                     ".*")
+        ids_module = IdentifierSet([id_adminstatus,id_operstatus,id_mac,id_description])
+        ids_gbic = IdentifierSet([id_gbic_modelname,id_gbic_partnumber,id_gbic_serial,
+                                id_gbic_adminstatus,id_gbic_operstatus,id_gbic_laserwavelength])
         def __init__(self,loo_commandlist):
             self.alltext = []
             self.modulelist = []
@@ -2058,33 +2138,35 @@ class Parser_Module():
             for chunk in self.chunklist:
                 temp_module = self.Module()
                 for line in chunk.chunkblock:
-                    if self.id_adminstatus.identifier.check_match(line):
-                        temp_module.adminstatus = self.id_adminstatus.identifier.give_group_value(line)
+                    ident,value = self.ids_module.first_match(line)
+                    if ident is self.id_adminstatus:
+                        temp_module.adminstatus = value
                     # The OPERSTATUS is the one we're picking for overall Module().status
-                    elif self.id_operstatus.identifier.check_match(line):
-                        temp_module.status = self.id_operstatus.identifier.give_group_value(line)
-                    elif self.id_mac.identifier.check_match(line):
-                        temp_module.mac = self.id_mac.identifier.give_group_value(line)
-                    elif self.id_description.identifier.check_match(line):
-                        temp_module.description = self.id_description.identifier.give_group_value(line)
+                    elif ident is self.id_operstatus:
+                        temp_module.status = value
+                    elif ident is self.id_mac:
+                        temp_module.mac = value
+                    elif ident is self.id_description:
+                        temp_module.description = value
                 # now check to see if has gbic info, if so, parse those gbic chunks
                 if chunk.hasgbics:
                     for chunk_gbic in chunk.gbic_chunks:
                         temp_gbic = temp_module.Gbic()
                         temp_gbic.id = chunk_gbic.gbicid
                         for line in chunk_gbic.chunkblock:
-                            if self.id_gbic_modelname.identifier.check_match(line):
-                                temp_gbic.modelname = self.id_gbic_modelname.identifier.give_group_value(line)
-                            elif self.id_gbic_partnumber.identifier.check_match(line):
-                                temp_gbic.partnumber = self.id_gbic_partnumber.identifier.give_group_value(line)
-                            elif self.id_gbic_serial.identifier.check_match(line):
-                                temp_gbic.serial = self.id_gbic_serial.identifier.give_group_value(line)
-                            elif self.id_gbic_adminstatus.identifier.check_match(line):
-                                temp_gbic.adminstatus = self.id_gbic_adminstatus.identifier.give_group_value(line)
-                            elif self.id_gbic_operstatus.identifier.check_match(line):
-                                temp_gbic.operstatus = self.id_gbic_operstatus.identifier.give_group_value(line)
-                            elif self.id_gbic_laserwavelength.identifier.check_match(line):
-                                temp_gbic.laserwavelength = self.id_gbic_laserwavelength.identifier.give_group_value(line)
+                            ident,value = self.ids_gbic.first_match(line)
+                            if ident is self.id_gbic_modelname:
+                                temp_gbic.modelname = value
+                            elif ident is self.id_gbic_partnumber:
+                                temp_gbic.partnumber = value
+                            elif ident is self.id_gbic_serial:
+                                temp_gbic.serial = value
+                            elif ident is self.id_gbic_adminstatus:
+                                temp_gbic.adminstatus = value
+                            elif ident is self.id_gbic_operstatus:
+                                temp_gbic.operstatus = value
+                            elif ident is self.id_gbic_laserwavelength:
+                                temp_gbic.laserwavelength = value
                         temp_module.gbics.append(temp_gbic)
                 self.modulelist.append(temp_module)
         def dump(self):
@@ -2157,24 +2239,30 @@ class Parser_Module():
     def finalize_modules(self):
         ''' takes the modulelist and then checks the other
         two lists for linking data and fills in 
-        the rest of the data.
-        '''
+        the rest of the data. Both lists are indexed once (the
+        last element for a key wins, same as scanning the whole
+        list per module).
+        '''
+        slotbymac = {}
+        for element in self.module_status.elementlist:
+            slotbymac[element.mac] = element.slot
+        partnumberbyslot = {}
+        for element in self.module.elementlist:
+            partnumberbyslot[element.slot] = element.partnumber
         for module in self.modulelist:
             ''' since module_long.modulelist = self.modulelist now 
             go through self.module and self.module_status to get rest 
             of the data we need.
             '''
-            for element in self.module_status.elementlist:
-                if element.mac == module.mac:
-                    module.slot = element.slot
+            if module.mac in slotbymac:
+                module.slot = slotbymac[module.mac]
             # now that we know the slot, we can tie in the partnumber
             #   from the 'show module' command.
             #   In hindsight, we don't really need the 'show module' 
             #   command since partnumber is in 'show module long' and
             #   can be tied to 'show module status' by mac address
-            for element in self.module.elementlist:
-                if element.slot == module.slot:
-                    module.partnumber = element.partnumber
+            if module.slot in partnumberbyslot:
+                module.partnumber = partnumberbyslot[module.slot]
             #print(module.dump())
     def dump(self):
         msg = ''
@@ -2524,10 +2612,8 @@ class Parser_Dhcp():
                     self.texttable = cmd.sectionoutput
         def stripextra(self,text):
             temp = []
-            import re
-            re_ip = re.compile("\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}")
             for i,line in enumerate(text):
-                re_ip_match = re.search(re_ip,line)
+                re_ip_match = re_ip.search(line)
                 if re_ip_match:
                     temp.append(line)
             return(temp)
@@ -2587,6 +2673,7 @@ class Parser_Dhcp():
             id_numsubnetsmanaged = ElementIdentifier('show dhcp-server statistics',
                                             "  Total Subnets Managed         : ",
                                             ".*")
+            ids_stats = IdentifierSet([id_servername,id_serverstatus,id_numsubnetsmanaged])
             def __init__(self,loo_commandlist):
                 self.text = []
                 self.attach_relevant_commandos(loo_commandlist)
@@ -2611,14 +2698,15 @@ class Parser_Dhcp():
                 logging.debug("SectionParser_ShowDhcpServerStatistics(): Length of element.text: " + str(len(self.text)))
                 if len(self.text) > 1:
                     for line in self.text:
-                        if self.id_servername.identifier.check_match(line):
-                            element.servername = self.id_servername.identifier.give_group_value(line)
+                        ident,value = self.ids_stats.first_match(line)
+                        if ident is self.id_servername:
+                            element.servername = value
 
-                        elif self.id_serverstatus.identifier.check_match(line):
-                            element.serverstatus = self.id_serverstatus.identifier.give_group_value(line)
+                        elif ident is self.id_serverstatus:
+                            element.serverstatus = value
 
-                        elif self.id_numsubnetsmanaged.identifier.check_match(line):
-                            element.numsubnetsmanaged = self.id_numsubnetsmanaged.identifier.give_group_value(line)
+                        elif ident is self.id_numsubnetsmanaged:
+                            element.numsubnetsmanaged = value
 
 
                 elif len(self.text) == 0:
@@ -2850,10 +2938,8 @@ class TableParser_ShowArp():
                 self.texttable = cmd.sectionoutput
     def stripextra(self,text):
         temp = []
-        import re
-        re_ip = re.compile("\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}")
         for i,line in enumerate(text):
-            re_ip_match = re.search(re_ip,line)
+            re_ip_match = re_ip.search(line)
             if re_ip_match:
                 temp.append(line)
         return(temp)
@@ -2976,7 +3062,7 @@ class SectionParser_ShowAmap_RemoteHosts():
                                         "  Operational Status = ",
                                         ".*")
         # sample line "Remote Host 'HRP_Bobo_Warehouse_SW2_EER' On Port 1/3 Vlan 1 :"
-        id_amap_remotehost_localslotport_localvlan_remotehostname = re.compile(
+        id_amap_remotehost_localslotport_localvlan_remotehostname = regexes.get(
             "(Remote Host ')(?P<hostname>.*)(' On Port )(?P<slotport>.*)( Vlan )(?P<vlan>\d*)")
 
         id_amap_remotehost_remotedevice = ElementIdentifier('show amap',
@@ -2992,8 +3078,12 @@ class SectionParser_ShowAmap_RemoteHosts():
                                         "  Remote Vlan             = ",
                                         ".*")
         # basically an IP regex with some leading spaces
-        id_amap_remotehost_remoteip = re.compile(
+        id_amap_remotehost_remoteip = regexes.get(
             "   \d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}")
+        ids_remotehost = IdentifierSet([id_amap_remotehost_remotedevice,
+                                        id_amap_remotehost_remotemac,
+                                        id_amap_remotehost_remoteslotport,
+                                        id_amap_remotehost_remotevlan])
 
         def __init__(self,loo_commandlist):
             self.text = []
@@ -3040,8 +3130,7 @@ class SectionParser_ShowAmap_RemoteHosts():
             chunklist = []
             # first go through and find the start lines
             for i,line in enumerate(self.text):
-                match_hostvlanslot = re.search(
-                    self.id_amap_remotehost_localslotport_localvlan_remotehostname,line)
+                match_hostvlanslot = self.id_amap_remotehost_localslotport_localvlan_remotehostname.search(line)
                 if match_hostvlanslot:
                     chunk = self.Chunk()
                     chunk.startline = i
@@ -3080,9 +3169,8 @@ class SectionParser_ShowAmap_RemoteHosts():
                 element = self.Element()
                 for line in chunk.chunkblock:
                     # set up the non ElementIdentifier regexes
-                    match_hostvlanslot = re.search(
-                        self.id_amap_remotehost_localslotport_localvlan_remotehostname,line)
-                    match_ip = re.search(self.id_amap_remotehost_remoteip,line)
+                    match_hostvlanslot = self.id_amap_remotehost_localslotport_localvlan_remotehostname.search(line)
+                    match_ip = self.id_amap_remotehost_remoteip.search(line)
                     
                     if match_hostvlanslot:
                         sp = match_hostvlanslot.group('slotport')
@@ -3096,18 +3184,20 @@ class SectionParser_ShowAmap_RemoteHosts():
                         ip = ip.rstrip(' :\r\n')
                         ip = ip.strip(' ')
                         element.remoteips.append(ip)
+                        continue
 
-                    elif self.id_amap_remotehost_remotedevice.identifier.check_match(line):
-                        element.remotedevice = self.id_amap_remotehost_remotedevice.identifier.give_group_value(line).rstrip(', ')
+                    ident,value = self.ids_remotehost.first_match(line)
+                    if ident is self.id_amap_remotehost_remotedevice:
+                        element.remotedevice = value.rstrip(', ')
 
-                    elif self.id_amap_remotehost_remotemac.identifier.check_match(line):
-                        element.remotemac = self.id_amap_remotehost_remotemac.identifier.give_group_value(line).rstrip(', ')
+                    elif ident is self.id_amap_remotehost_remotemac:
+                        element.remotemac = value.rstrip(', ')
 
-                    elif self.id_amap_remotehost_remoteslotport.identifier.check_match(line):
-                        element.remoteslotport = self.id_amap_remotehost_remoteslotport.identifier.give_group_value(line).rstrip(', ')
+                    elif ident is self.id_amap_remotehost_remoteslotport:
+                        element.remoteslotport = value.rstrip(', ')
 
-                    elif self.id_amap_remotehost_remotevlan.identifier.check_match(line):
-                        element.remotevlan = self.id_amap_remotehost_remotevlan.identifier.give_group_value(line).rstrip(', ')
+                    elif ident is self.id_amap_remotehost_remotevlan:
+                        element.remotevlan = value.rstrip(', ')
                 elementlist.append(element)
             return(elementlist)
         def detect_operstatus(self):